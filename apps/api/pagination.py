@@ -0,0 +1,160 @@
+"""Keyset (cursor) pagination.
+
+Stranica vybiraetsya usloviem po klyuchu sortirovki (naprimer created_at, id)
+vmesto OFFSET, i COUNT(*) ne schitaetsya, poetomu lyubaya stranica stoit
+odinakovo, kak by gluboko ni prolistal polzovatel'.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor po sostavnomu klyuchu `ordering`; poslednee pole dolzhno byt' unikal'nym"""
+
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.page_size or 10
+        position, reverse = self.decode_cursor(request, queryset)
+
+        ordering = self.ordering if not reverse else tuple(self._flip(f) for f in self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, ordering))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    # ---------- cursor ----------
+
+    def encode_cursor(self, obj, reverse):
+        values = []
+        for field in self._fields():
+            value = getattr(obj, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'p': values, 'r': int(reverse)}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, queryset):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            raw = payload['p']
+            fields = self._fields()
+            if len(raw) != len(fields):
+                raise ValueError
+            position = [self._to_python(queryset, f, v) for f, v in zip(fields, raw)]
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _to_python(self, queryset, field, value):
+        if field in queryset.query.annotations:
+            return queryset.query.annotations[field].output_field.to_python(value)
+        try:
+            return queryset.model._meta.get_field(field).to_python(value)
+        except FieldDoesNotExist:
+            return value
+
+    # ---------- ordering ----------
+
+    def _fields(self):
+        return [f.lstrip('-') for f in self.ordering]
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _after(position, ordering):
+        """(a, b) > (x, y) s uchetom napravleniya kazhdogo polya"""
+        condition = Q()
+        for i in range(len(ordering) - 1, -1, -1):
+            field = ordering[i].lstrip('-')
+            lookup = 'lt' if ordering[i].startswith('-') else 'gt'
+            step = Q(**{f'{field}__{lookup}': position[i]})
+            if i < len(ordering) - 1:
+                step |= Q(**{field: position[i]}) & condition
+            condition = step
+        return condition
+
+
+class AscendingKeysetPagination(KeysetPagination):
+    """Dlya lent, kotorye chitayutsya ot starykh k novym (kommentarii)"""
+
+    ordering = ('created_at', 'id')
+
+
+class RankedKeysetPagination(KeysetPagination):
+    """Dlya ranzhirovannoi lenty po predraschitannomu skoru"""
+
+    ordering = ('-score', '-id')
+
+
+class SearchKeysetPagination(KeysetPagination):
+    """Dlya rezul'tatov poiska po rank"""
+
+    ordering = ('-rank', '-id')
+
+
+class ChatKeysetPagination(KeysetPagination):
+    """Dlya spiska chatov po poslednei aktivnosti"""
+
+    ordering = ('-last_activity_at', '-id')
+
+
+class NotificationKeysetPagination(KeysetPagination):
+    """Dlya uvedomlenii: svernutye podnimayutsya pri novoi aktivnosti"""
+
+    ordering = ('-updated_at', '-id')
@@ -0,0 +1,287 @@
+"""Sektsionirovanie Message i Notification po created_at (Postgres RANGE).
+
+Tablitsa razbita na mesyachnye sektsii <table>_pYYYYMM i sektsiyu
+<table>_default dlya strok vne sozdannyh diapazonov. Indeksy kazhdoi
+sektsii malen'kie, poetomu vstavka i goryachie stranitsy indeksov
+ostayutsya v pamyati, a staruyu istoriyu mozhno otsoedinit' tselikom, bez
+DELETE.
+
+manage.py manage_partitions sozdaet sektsii na MONTHS_AHEAD vpered i
+otsoedinyaet sektsii starshe RETAIN_MONTHS: soderzhimoe vygruzhaetsya v
+ARCHIVE_DIR/<table>/<YYYYMM>/<klyuch>.csv.gz (klyuch - chat_id dlya
+soobshchenii, recipient_id dlya uvedomlenii), posle chego sektsiya
+udalyaetsya. Arhiv chitaetsya read-only endpoint'ami history.
+"""
+import csv
+import gzip
+import os
+import re
+import shutil
+import tempfile
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+PARTITION_RE = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def _options():
+    return settings.PARTITIONING
+
+
+def tables():
+    return list(_options()['TABLES'])
+
+
+def archive_key(table):
+    return _options()['TABLES'][table]
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def parse_month(value):
+    """'YYYY-MM' -> date; ValueError pri nevernom formate"""
+    year, month = value.split('-')
+    return date(int(year), int(month), 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def _create_partition(cursor, table, month):
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def convert_to_partitioned(schema_editor, table, months_ahead=None):
+    """Perestroit' obychnuyu tablitsu v sektsionirovannuyu (dlya migratsii).
+
+    Indeksy, FK i CHECK perenosyatsya s temi zhe imenami, poetomu
+    sostoyanie migratsii Django ne menyaetsya. Pervichnyi klyuch
+    stanovitsya (id, created_at): Postgres trebuet klyuch sektsii v
+    unikal'nyh ogranicheniyah.
+    """
+    months_ahead = months_ahead if months_ahead is not None else _options()['MONTHS_AHEAD']
+    legacy = f'{table}_legacy'
+    execute = schema_editor.execute
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes '
+            'WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s',
+            [table, f'{table}_pkey'],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('f', 'c')",
+            [table],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(f'SELECT MIN(created_at) FROM {table}')
+        oldest = cursor.fetchone()[0]
+
+        execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+        # Первичный ключ переезжает вместе с таблицей — освободить имя {table}_pkey
+        execute(f'ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey')
+        # Имена освобождаются для таблицы-родителя
+        for name, _ in indexes:
+            execute(f'DROP INDEX {name}')
+        for name, _ in constraints:
+            execute(f'ALTER TABLE {legacy} DROP CONSTRAINT {name}')
+
+        execute(
+            f'CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)')
+        # serial-колонка: последовательность принадлежит старой таблице и удалилась бы вместе с ней
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'",
+            [table],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [legacy, 'id'])
+            sequence = cursor.fetchone()[0]
+            if sequence:
+                execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+
+        execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+        current = month_start(timezone.now())
+        month = month_start(oldest) if oldest is not None else current
+        while month <= add_months(current, months_ahead):
+            _create_partition(cursor, table, month)
+            month = add_months(month, 1)
+
+        execute(f'INSERT INTO {table} SELECT * FROM {legacy}')
+        for name, definition in constraints:
+            execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+        for _, definition in indexes:
+            execute(definition)
+        execute(f'DROP TABLE {legacy}')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {table}"
+        )
+
+
+def partitions(table):
+    """Mesyachnye sektsii tablitsy: [(month, name)] po vozrastaniyu"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass',
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    result = []
+    for name in names:
+        match = PARTITION_RE.search(name)
+        if match:
+            result.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(result)
+
+
+def ensure_partitions(table, months_ahead=None):
+    """Sozdat' sektsii ot tekushchego mesyatsa na months_ahead vpered, vernut' novye"""
+    months_ahead = months_ahead if months_ahead is not None else _options()['MONTHS_AHEAD']
+    existing = {month for month, _ in partitions(table)}
+    current = month_start(timezone.now())
+    created = []
+    with connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if month not in existing:
+                _create_partition(cursor, table, month)
+                created.append(partition_name(table, month))
+    return created
+
+
+def _archive_dir(table, month=None):
+    base = os.path.join(_options()['ARCHIVE_DIR'], table)
+    return base if month is None else os.path.join(base, f'{month:%Y%m}')
+
+
+def detached_partitions(table):
+    """Sektsii, otsoedinennye, no eshche ne udalennye (arhivatsiya prervalas')"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname FROM pg_class "
+            "WHERE relnamespace = current_schema()::regnamespace AND relkind = 'r' "
+            "AND NOT relispartition AND relname ~ %s",
+            [rf'^{table}_p\d{{6}}$'],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    result = []
+    for name in names:
+        match = PARTITION_RE.search(name)
+        result.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(result)
+
+
+def archive_partition(table, month):
+    """Otsoedinit' sektsiyu, vygruzit' v gzip-fail'y po klyuchu, udalit' sektsiyu.
+
+    Tri korotkih shaga vmesto odnoi dlinnoi tranzaktsii: DETACH (ACCESS
+    EXCLUSIVE na roditelya tol'ko na vremya samogo DETACH), vygruzka iz
+    uzhe otsoedinennoi tablitsy bez blokirovok roditelya, DROP posle togo,
+    kak arhiv lezhit na meste. Pri sboe posle DETACH stroki ostayutsya v
+    otsoedinennoi tablitse, i povtornyi zapusk dodelaet arhivatsiyu.
+    DETACH ... CONCURRENTLY zdes' nedostupen: u tablits est' sektsiya DEFAULT.
+    """
+    name = partition_name(table, month)
+    key = archive_key(table)
+    target = _archive_dir(table, month)
+    staging = f'{target}.tmp'
+
+    if name in {partition for _, partition in partitions(table)}:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # Не вставать в очередь за долгими запросами, держа блокировку
+                cursor.execute('SET LOCAL lock_timeout = %s', [f"{_options()['DETACH_LOCK_TIMEOUT']}s"])
+                cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    with connection.cursor() as cursor:
+        with tempfile.TemporaryFile('w+', newline='') as dump:
+            cursor.copy_expert(
+                f'COPY (SELECT * FROM {name} ORDER BY {key}, created_at, id) '
+                f'TO STDOUT WITH (FORMAT csv, HEADER true)',
+                dump,
+            )
+            dump.seek(0)
+            _split_by_key(csv.reader(dump), key, staging)
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.rename(staging, target)
+
+    # Таблица уже не часть родителя: откат здесь не вернёт строки в выборки
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {name}')
+    return target
+
+
+def _split_by_key(rows, key, directory):
+    """Stroki otsortirovany po klyuchu: v kazhdyi moment otkryt odin fail"""
+    header = next(rows, None)
+    if header is None:
+        return
+    position = header.index(key)
+    current, out, writer = None, None, None
+    try:
+        for row in rows:
+            if row[position] != current:
+                if out is not None:
+                    out.close()
+                current = row[position]
+                out = gzip.open(os.path.join(directory, f'{current}.csv.gz'), 'wt', newline='')
+                writer = csv.writer(out)
+                writer.writerow(header)
+            writer.writerow(row)
+    finally:
+        if out is not None:
+            out.close()
+
+
+def archive_old(table, retain_months=None):
+    """Arhivirovat' vse sektsii starshe retain_months, vernut' ih mesyatsy"""
+    retain_months = retain_months if retain_months is not None else _options()['RETAIN_MONTHS']
+    cutoff = add_months(month_start(timezone.now()), -retain_months)
+    # Прерванные архивации добиваются всегда: их строки уже не видны в выборках
+    archived = [month for month, _ in detached_partitions(table)]
+    archived += [month for month, _ in partitions(table) if month < cutoff]
+    for month in archived:
+        archive_partition(table, month)
+    return archived
+
+
+def archived_months(table, key_value):
+    """Mesyatsy, za kotorye v arhive est' fail dlya klyucha"""
+    base = _archive_dir(table)
+    if not os.path.isdir(base):
+        return []
+    months = []
+    for entry in sorted(os.listdir(base)):
+        if re.fullmatch(r'\d{6}', entry) and os.path.exists(os.path.join(base, entry, f'{key_value}.csv.gz')):
+            months.append(date(int(entry[:4]), int(entry[4:]), 1))
+    return months
+
+
+def read_archive(table, month, key_value):
+    """Stroki arhiva za mesyats dlya klyucha (slovari so strokovymi znacheniyami)"""
+    path = os.path.join(_archive_dir(table, month), f'{key_value}.csv.gz')
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, 'rt', newline='') as archive:
+        return list(csv.DictReader(archive))
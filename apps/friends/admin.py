@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FriendRequest, Friendship, Follow
+from .models import FriendRequest, Friendship, Follow, FriendSuggestion
 
 
 @admin.register(FriendRequest)
@@ -41,4 +41,13 @@ class FollowAdmin(admin.ModelAdmin):
     fieldsets = (
         (None, {"fields": ("follower", "following")}),
         ("Дополнительно", {"fields": ("created_at",)}),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(FriendSuggestion)
+class FriendSuggestionAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "candidate", "mutual_friends", "shared_follows", "score", "updated_at")
+    search_fields = ("user__username", "candidate__username")
+    ordering = ("user", "-score")
+    raw_id_fields = ("user", "candidate")
+    readonly_fields = ("updated_at",)
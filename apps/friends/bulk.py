@@ -0,0 +1,139 @@
+"""Massovyi import i eksport sotsial'nogo grafa cherez COPY.
+
+Stroki Friendship/Follow zagruzhayutsya COPY vo vremennuyu tablitsu i
+perenosyatsya odnim INSERT ... SELECT: poryadok user1 < user2,
+samodruzhba, dubli i nesushchestvuyushchie polzovateli otsekayutsya v SQL,
+bez Friendship.save i bez signalov na kazhduyu stroku. Proizvodnoe
+sostoyanie (kesh grafa, rekomendatsii, lenty, kesh lenty) popravlyaetsya
+odin raz dlya vseh zatronutyh polzovatelei v refresh_derived().
+
+Formaty: csv (dve kolonki id) i binary (COPY BINARY, dve kolonki int8 -
+imenno takie fail'y pishet export_rows).
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from . import graph, suggestions
+from .models import Friendship, Follow
+
+User = get_user_model()
+
+FRIENDSHIPS = 'friendships'
+FOLLOWS = 'follows'
+KINDS = (FRIENDSHIPS, FOLLOWS)
+
+CSV = 'csv'
+BINARY = 'binary'
+FORMATS = (CSV, BINARY)
+
+STAGING_TABLE = 'graph_import_staging'
+
+# Сколько пользователей обрабатывать за раз при пересчёте производных данных
+FIXUP_BATCH_SIZE = 1000
+
+FRIENDSHIP_INSERT_SQL = """
+WITH inserted AS (
+    INSERT INTO {friendship} (user1_id, user2_id, created_at)
+    SELECT DISTINCT LEAST(s.a, s.b), GREATEST(s.a, s.b), now()
+    FROM {staging} s
+    JOIN {user} u1 ON u1.{user_pk} = s.a
+    JOIN {user} u2 ON u2.{user_pk} = s.b
+    WHERE s.a <> s.b
+    ON CONFLICT (user1_id, user2_id) DO NOTHING
+    RETURNING user1_id, user2_id
+),
+-- Друзья не подписаны друг на друга: то же делает сигнал принятия заявки
+unfollowed AS (
+    DELETE FROM {follow} f
+    USING inserted i
+    WHERE (f.follower_id = i.user1_id AND f.following_id = i.user2_id)
+       OR (f.follower_id = i.user2_id AND f.following_id = i.user1_id)
+)
+SELECT user1_id, user2_id FROM inserted
+"""
+
+FOLLOW_INSERT_SQL = """
+INSERT INTO {follow} (follower_id, following_id, created_at)
+SELECT DISTINCT s.a, s.b, now()
+FROM {staging} s
+JOIN {user} u1 ON u1.{user_pk} = s.a
+JOIN {user} u2 ON u2.{user_pk} = s.b
+WHERE s.a <> s.b
+ON CONFLICT (follower_id, following_id) DO NOTHING
+RETURNING follower_id, following_id
+"""
+
+EXPORT_SQL = {
+    FRIENDSHIPS: 'SELECT user1_id::bigint, user2_id::bigint FROM {friendship} ORDER BY user1_id, user2_id',
+    FOLLOWS: 'SELECT follower_id::bigint, following_id::bigint FROM {follow} ORDER BY follower_id, following_id',
+}
+
+
+def _tables():
+    return {
+        'friendship': Friendship._meta.db_table,
+        'follow': Follow._meta.db_table,
+        'user': User._meta.db_table,
+        'user_pk': User._meta.pk.column,
+        'staging': STAGING_TABLE,
+    }
+
+
+def _copy_options(fmt, header):
+    if fmt == BINARY:
+        return '(FORMAT binary)'
+    return '(FORMAT csv, HEADER true)' if header else '(FORMAT csv)'
+
+
+def import_rows(kind, stream, fmt=CSV, header=False):
+    """Zagruzit' rebra iz potoka, vernut' (chislo novyh strok, zatronutye id)"""
+    if kind not in KINDS:
+        raise ValueError(f'Unknown graph kind: {kind}')
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format: {fmt}')
+    tables = _tables()
+    insert_sql = FRIENDSHIP_INSERT_SQL if kind == FRIENDSHIPS else FOLLOW_INSERT_SQL
+    affected = set()
+    inserted = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE TEMP TABLE {STAGING_TABLE} (a bigint, b bigint) ON COMMIT DROP')
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} (a, b) FROM STDIN WITH {_copy_options(fmt, header)}',
+                stream,
+            )
+            cursor.execute(insert_sql.format(**tables))
+            for a, b in cursor.fetchall():
+                affected.add(a)
+                affected.add(b)
+                inserted += 1
+    return inserted, affected
+
+
+def export_rows(kind, stream, fmt=CSV, header=False):
+    """Vygruzit' rebra v potok v tom zhe formate, chto chitaet import_rows"""
+    if kind not in KINDS:
+        raise ValueError(f'Unknown graph kind: {kind}')
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format: {fmt}')
+    query = EXPORT_SQL[kind].format(**_tables())
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY ({query}) TO STDOUT WITH {_copy_options(fmt, header)}', stream)
+
+
+def refresh_derived(user_ids, rebuild_timelines=True):
+    """Popravit' keshi, rekomendatsii i lenty posle importa bez signalov"""
+    from apps.posts import feed_cache, timeline
+
+    user_ids = sorted(user_ids)
+    for start in range(0, len(user_ids), FIXUP_BATCH_SIZE):
+        batch = user_ids[start:start + FIXUP_BATCH_SIZE]
+        # Импорт дружбы ещё и снимает подписки, поэтому сбрасываются все три вида
+        for kind in (graph.FRIENDS, graph.FOLLOWINGS, graph.FOLLOWERS):
+            graph.invalidate(kind, batch)
+        suggestions.queue(batch)
+        if rebuild_timelines:
+            for user_id in batch:
+                with transaction.atomic():
+                    timeline.rebuild(user_id)
+        feed_cache.bump(batch)
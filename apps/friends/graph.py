@@ -0,0 +1,158 @@
+"""Keshirovannyi social'nyi graf.
+
+Dlya kazhdogo polzovatelya v keshe lezhat otsortirovannye massivy int64
+(array('q')): druz'ya, podpiski i podpischiki. Voprosy "druz'ya X",
+"podpiski X", "druz'ya li X i Y" otvechayutsya iz kesha (bisect po
+massivu) bez OR po dvum indeksam Friendship. Keshi sbrasyvayut signaly
+Friendship/Follow (apps/friends/signals.py).
+
+Kesh vklyuchaetsya tol'ko s obshchim backend'om (SOCIAL_GRAPH_CACHE_ENABLED,
+po umolchaniyu pri REDIS_CACHE_URL): sbros v LocMemCache viden lish'
+odnomu vorkeru. Bez kesha massivy stroyatsya iz BD na kazhdyi vyzov.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Friendship, Follow
+
+FRIENDS = 'friends'
+FOLLOWINGS = 'followings'
+FOLLOWERS = 'followers'
+
+
+def _key(kind, user_id):
+    return f'graph:{kind}:{user_id}'
+
+
+def _pack(ids):
+    return array('q', sorted(set(ids))).tobytes()
+
+
+def _unpack(raw):
+    ids = array('q')
+    ids.frombytes(raw)
+    return ids
+
+
+class TooManyRows(Exception):
+    """Sosedei bol'she, chem razreshennyi limit"""
+
+
+def _limited(rows, limit):
+    """LIMIT limit + 1 v zaprose: lishnyaya stroka znachit, chto limit prevyshen"""
+    if limit is None:
+        return rows
+    rows = list(rows[:limit + 1])
+    if len(rows) > limit:
+        raise TooManyRows
+    return rows
+
+
+def _load(kind, user_ids, limit=None):
+    """Odin zapros na vse promahi kesha"""
+    adjacency = {user_id: [] for user_id in user_ids}
+    if kind == FRIENDS:
+        rows = Friendship.objects.filter(
+            Q(user1_id__in=user_ids) | Q(user2_id__in=user_ids)
+        ).values_list('user1_id', 'user2_id')
+        for user1_id, user2_id in _limited(rows, limit):
+            if user1_id in adjacency:
+                adjacency[user1_id].append(user2_id)
+            if user2_id in adjacency:
+                adjacency[user2_id].append(user1_id)
+    elif kind == FOLLOWINGS:
+        for follower_id, following_id in _limited(Follow.objects.filter(
+            follower_id__in=user_ids
+        ).values_list('follower_id', 'following_id'), limit):
+            adjacency[follower_id].append(following_id)
+    else:
+        for follower_id, following_id in _limited(Follow.objects.filter(
+            following_id__in=user_ids
+        ).values_list('follower_id', 'following_id'), limit):
+            adjacency[following_id].append(follower_id)
+    return adjacency
+
+
+def enabled():
+    return settings.SOCIAL_GRAPH_CACHE_ENABLED
+
+
+def _get_many(kind, user_ids, limit=None):
+    """limit - maksimum id sosedei na ves' paket (TooManyRows pri prevyshenii);
+    chastichno zagruzhennye spiski v kesh ne popadayut"""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    if not enabled():
+        return {user_id: _unpack(_pack(ids)) for user_id, ids in _load(kind, user_ids, limit).items()}
+    cached = cache.get_many([_key(kind, user_id) for user_id in user_ids])
+    result = {}
+    missing = []
+    for user_id in user_ids:
+        raw = cached.get(_key(kind, user_id))
+        if raw is None:
+            missing.append(user_id)
+        else:
+            result[user_id] = _unpack(raw)
+    if limit is not None:
+        limit -= sum(len(ids) for ids in result.values())
+        if limit < 0:
+            raise TooManyRows
+    if missing:
+        packed = {user_id: _pack(ids) for user_id, ids in _load(kind, missing, limit).items()}
+        cache.set_many(
+            {_key(kind, user_id): raw for user_id, raw in packed.items()},
+            timeout=settings.SOCIAL_GRAPH_CACHE_TIMEOUT,
+        )
+        for user_id, raw in packed.items():
+            result[user_id] = _unpack(raw)
+    return result
+
+
+def friends_of(user_id):
+    return _get_many(FRIENDS, [user_id])[user_id]
+
+
+def friends_of_many(user_ids, limit=None):
+    return _get_many(FRIENDS, user_ids, limit)
+
+
+def followings_of(user_id):
+    return _get_many(FOLLOWINGS, [user_id])[user_id]
+
+
+def followings_of_many(user_ids):
+    return _get_many(FOLLOWINGS, user_ids)
+
+
+def followers_of(user_id):
+    return _get_many(FOLLOWERS, [user_id])[user_id]
+
+
+def contains(ids, user_id):
+    """Poisk v otsortirovannom massive"""
+    i = bisect_left(ids, user_id)
+    return i < len(ids) and ids[i] == user_id
+
+
+def are_friends(user_id, other_id):
+    return contains(friends_of(user_id), other_id)
+
+
+def follows(user_id, other_id):
+    return contains(followings_of(user_id), other_id)
+
+
+def invalidate(kind, user_ids):
+    """Sbrosit' srazu i eshche raz posle kommita: chtenie vnutri tranzaktsii
+    moglo polozhit' v kesh nezakommichennoe sostoyanie"""
+    if not enabled():
+        return
+    keys = [_key(kind, user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.friends import bulk
+
+
+class Command(BaseCommand):
+    help = 'Vygruzit\' Friendship/Follow v CSV ili COPY BINARY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=bulk.KINDS)
+        parser.add_argument('path', help='Kuda pisat\'; "-" - stdout')
+        parser.add_argument('--format', choices=bulk.FORMATS, default=bulk.CSV)
+        parser.add_argument('--header', action='store_true', help='Dobavit\' zagolovok CSV')
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        if options['header'] and fmt != bulk.CSV:
+            raise CommandError('--header is only valid with --format csv')
+        if options['path'] == '-':
+            stream = sys.stdout.buffer if fmt == bulk.BINARY else sys.stdout
+            bulk.export_rows(options['kind'], stream, fmt, options['header'])
+            return
+        mode = 'wb' if fmt == bulk.BINARY else 'w'
+        with open(options['path'], mode) as stream:
+            bulk.export_rows(options['kind'], stream, fmt, options['header'])
+        self.stdout.write(self.style.SUCCESS(f'Exported {options["kind"]} to {options["path"]}'))
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.friends import bulk
+
+
+class Command(BaseCommand):
+    help = 'Zagruzit\' Friendship/Follow iz CSV ili COPY BINARY bez signalov na kazhduyu stroku'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=bulk.KINDS)
+        parser.add_argument('path', help='Fail s rebrami (dve kolonki id); "-" - stdin')
+        parser.add_argument('--format', choices=bulk.FORMATS, default=bulk.CSV)
+        parser.add_argument('--header', action='store_true', help='Pervaya stroka CSV - zagolovok')
+        parser.add_argument('--skip-timelines', action='store_true',
+                            help='Ne perestraivat\' lenty (potom manage.py rebuild_timelines)')
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        if options['header'] and fmt != bulk.CSV:
+            raise CommandError('--header is only valid with --format csv')
+        mode = 'rb' if fmt == bulk.BINARY else 'r'
+        if options['path'] == '-':
+            stream = sys.stdin.buffer if fmt == bulk.BINARY else sys.stdin
+            inserted, affected = bulk.import_rows(options['kind'], stream, fmt, options['header'])
+        else:
+            with open(options['path'], mode) as stream:
+                inserted, affected = bulk.import_rows(options['kind'], stream, fmt, options['header'])
+        bulk.refresh_derived(affected, rebuild_timelines=not options['skip_timelines'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {inserted} {options["kind"]}, refreshed {len(affected)} users'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.friends import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Pereschitat\' rekomendatsii druzei iz ocheredi (ili vse s --all)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Pereschitat\' vseh polzovatelei')
+        parser.add_argument('--batch-size', type=int, help='Polzovatelei v odnom zaprose')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            processed = suggestions.refresh_all(options['batch_size'])
+        else:
+            processed = suggestions.refresh_queued(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed suggestions for {processed} users'))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('friends', '0002_rename_friends_fri_receive_2db123_idx_friends_fri_receive_79aa1f_idx'),
+        ('users', '0004_avatar_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestionQueue',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('queued_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FriendSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mutual_friends', models.PositiveIntegerField(default=0)),
+                ('shared_follows', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friend_suggestions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['user', '-score'], name='friends_fri_user_id_75392a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'candidate'), name='unique_friend_suggestion')],
+            },
+        ),
+    ]
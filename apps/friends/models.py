@@ -135,4 +135,47 @@ class Follow(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"Follow({self.follower}->{self.following})"
\ No newline at end of file
+        return f"Follow({self.follower}->{self.following})"
+
+
+class FriendSuggestion(models.Model):
+    """Predraschitannaya rekomendatsiya "vozmozhno, vy znakomy" """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='friend_suggestions',
+    )
+    candidate = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    mutual_friends = models.PositiveIntegerField(default=0)
+    shared_follows = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'candidate'], name='unique_friend_suggestion'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score']),
+        ]
+        ordering = ['-score']
+
+    def __str__(self):
+        return f"FriendSuggestion({self.user_id}->{self.candidate_id}, mutual={self.mutual_friends})"
+
+
+class SuggestionQueue(models.Model):
+    """Polzovateli, ch'i rekomendatsii ustareli iz-za izmeneniya grafa"""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+    )
+    queued_at = models.DateTimeField(default=timezone.now)
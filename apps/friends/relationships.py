@@ -0,0 +1,77 @@
+"""Otnoshenie zritelya k paketu polzovatelei za fiksirovannoe chislo zaprosov.
+
+Status, kotoryi vidit polzovatel' (druzhba, podpiski v obe storony),
+chitaetsya iz BD: po zaprosu na druzei zritelya, ego podpiski i zayavki.
+Iz grafa berutsya tol'ko druz'ya ostal'nyh dlya podscheta obshchih druzei.
+"""
+from django.db.models import Q
+
+from .models import FriendRequest, Friendship, Follow
+from . import graph
+
+MAX_IDS = 200
+
+SELF = 'self'
+FRIEND = 'friend'
+REQUEST_SENT = 'request_sent'
+REQUEST_RECEIVED = 'request_received'
+FOLLOWING = 'following'
+NONE = 'none'
+
+
+def relationships_of(viewer_id, user_ids):
+    """{user_id: {'status', 'mutual_friends', 'following', 'followed_by'}}"""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+
+    viewer_friends = set()
+    for user1_id, user2_id in Friendship.objects.filter(
+        Q(user1_id=viewer_id) | Q(user2_id=viewer_id)
+    ).values_list('user1_id', 'user2_id'):
+        viewer_friends.add(user2_id if user1_id == viewer_id else user1_id)
+    others = [user_id for user_id in user_ids if user_id != viewer_id]
+    friends = graph.friends_of_many(others)
+
+    followings = set()
+    followers = set()
+    for follower_id, following_id in Follow.objects.filter(
+        Q(follower_id=viewer_id, following_id__in=user_ids) | Q(follower_id__in=user_ids, following_id=viewer_id),
+    ).values_list('follower_id', 'following_id'):
+        if follower_id == viewer_id:
+            followings.add(following_id)
+        else:
+            followers.add(follower_id)
+
+    sent = set()
+    received = set()
+    for sender_id, receiver_id in FriendRequest.objects.filter(
+        Q(sender_id=viewer_id, receiver_id__in=user_ids) | Q(sender_id__in=user_ids, receiver_id=viewer_id),
+        status=FriendRequest.STATUS_PENDING,
+    ).values_list('sender_id', 'receiver_id'):
+        if sender_id == viewer_id:
+            sent.add(receiver_id)
+        else:
+            received.add(sender_id)
+
+    result = {}
+    for user_id in user_ids:
+        if user_id == viewer_id:
+            status = SELF
+        elif user_id in viewer_friends:
+            status = FRIEND
+        elif user_id in sent:
+            status = REQUEST_SENT
+        elif user_id in received:
+            status = REQUEST_RECEIVED
+        elif user_id in followings:
+            status = FOLLOWING
+        else:
+            status = NONE
+        result[user_id] = {
+            'status': status,
+            'mutual_friends': 0 if user_id == viewer_id else len(viewer_friends.intersection(friends[user_id])),
+            'following': user_id in followings,
+            'followed_by': user_id in followers,
+        }
+    return result
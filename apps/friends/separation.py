@@ -0,0 +1,96 @@
+"""Kratchaishaya tsepochka druzhby mezhdu dvumya polzovatelyami.
+
+Dvunapravlennyi poisk v shirinu: na kazhdom shage raskryvaetsya men'shii
+iz dvuh frontov, sosedi fronta berutsya iz grafa paketami po CHUNK uzlov
+(odin zapros na promahi kesha). Byudzhet NODE_BUDGET ogranichivaet chislo
+zagruzhennyh id sosedei: ostatok byudzheta idet v LIMIT zaprosa paketa, tak chto
+polzovateli s ogromnym chislom druzei ne razduvayut rabotu.
+"""
+from django.conf import settings
+
+from . import graph
+
+
+class BudgetExceeded(Exception):
+    """Poisk posetil bol'she uzlov, chem razresheno"""
+
+
+def _path(meeting, forward, backward):
+    path = []
+    node = meeting
+    while node is not None:
+        path.append(node)
+        node = forward[node]
+    path.reverse()
+    node = backward[meeting]
+    while node is not None:
+        path.append(node)
+        node = backward[node]
+    return path
+
+
+def shortest_path(source_id, target_id, max_depth=None, node_budget=None):
+    """Spisok id ot source do target vklyuchitel'no ili None, esli dal'she max_depth"""
+    options = settings.FRIEND_PATH
+    max_depth = min(max_depth or options['MAX_DEPTH'], options['MAX_DEPTH'])
+    node_budget = node_budget or options['NODE_BUDGET']
+    chunk = options['CHUNK']
+    if source_id == target_id:
+        return [source_id]
+
+    # родитель и глубина каждого посещённого узла в своём направлении
+    forward = {source_id: None}
+    backward = {target_id: None}
+    forward_depth = {source_id: 0}
+    backward_depth = {target_id: 0}
+    forward_frontier = [source_id]
+    backward_frontier = [target_id]
+    depth = 0
+    scanned = 0  # сколько id соседей уже загружено
+
+    while forward_frontier and backward_frontier and depth < max_depth:
+        if len(forward_frontier) <= len(backward_frontier):
+            frontier, parents, depths, other_depths = forward_frontier, forward, forward_depth, backward_depth
+        else:
+            frontier, parents, depths, other_depths = backward_frontier, backward, backward_depth, forward_depth
+
+        next_frontier = []
+        meeting = None
+        # Фронт грузится кусками: бюджет проверяется до каждой загрузки,
+        # и один узел-хаб не тянет за собой соседей всего уровня
+        for start in range(0, len(frontier), chunk):
+            if scanned > node_budget:
+                raise BudgetExceeded
+            try:
+                # LIMIT остатка бюджета: кусок из хабов не загрузит миллионы строк
+                adjacency = graph.friends_of_many(frontier[start:start + chunk], limit=node_budget - scanned)
+            except graph.TooManyRows:
+                raise BudgetExceeded from None
+            for node, neighbours in adjacency.items():
+                scanned += len(neighbours)
+                for neighbour in neighbours:
+                    if neighbour in other_depths:
+                        # встречи внутри уровня бывают разной длины — берём короткую
+                        length = depths[node] + 1 + other_depths[neighbour]
+                        if meeting is None or length < meeting[0]:
+                            meeting = (length, node, neighbour)
+                    if neighbour in parents:
+                        continue
+                    parents[neighbour] = node
+                    depths[neighbour] = depths[node] + 1
+                    next_frontier.append(neighbour)
+        depth += 1
+
+        if meeting is not None:
+            length, node, neighbour = meeting
+            if length > max_depth:
+                return None
+            if parents is forward:
+                return _path(node, forward, {**backward, node: neighbour})
+            return _path(neighbour, forward, {**backward, neighbour: node})
+
+        if parents is forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+    return None
@@ -2,13 +2,13 @@ from rest_framework import serializers
 from django.db.models import Q
 from django.utils import timezone
 from django.conf import settings
-from .models import FriendRequest, Friendship, Follow
+from .models import FriendRequest, Friendship, Follow, FriendSuggestion
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 class FriendRequestSerializer(serializers.ModelSerializer):
-    sender = serializers.HiddenField(default=serializers.CurrentUserDefault)
+    sender = serializers.HiddenField(default=serializers.CurrentUserDefault())
     receiver = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
 
     class Meta:
@@ -17,7 +17,7 @@ class FriendRequestSerializer(serializers.ModelSerializer):
         read_only_fields = ['status', 'created_at']
     
     def __init__(self, *args, **kwargs):
-        super().__init__(self, *args, **kwargs)
+        super().__init__(*args, **kwargs)
         self.fields['receiver'].queryset = get_user_model().objects.all()
     
     def validate(self, attrs):
@@ -26,9 +26,8 @@ class FriendRequestSerializer(serializers.ModelSerializer):
 
         if sender == receiver:
             raise serializers.ValidationError('u cant request yourself')
-        if Friendship.objects.filter(
-            Q(user1=sender, user2=receiver) | Q(user1=receiver, user2=sender)
-        ).exists():
+        user1_id, user2_id = sorted((sender.id, receiver.id))
+        if Friendship.objects.filter(user1_id=user1_id, user2_id=user2_id).exists():
             raise serializers.ValidationError('Youre friends')
         
         existing_request = FriendRequest.objects.filter(
@@ -70,4 +69,14 @@ class FolloweSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Follow
-        fields = ['id', 'follower', 'following', 'created_at']
\ No newline at end of file
+        fields = ['id', 'follower', 'following', 'created_at']
+
+class FriendSuggestionSerializer(serializers.ModelSerializer):
+    user = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FriendSuggestion
+        fields = ['user', 'mutual_friends', 'shared_follows', 'score', 'updated_at']
+
+    def get_user(self, obj):
+        return {'id': obj.candidate_id, 'username': obj.candidate.username}
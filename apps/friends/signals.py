@@ -2,6 +2,7 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.db import transaction
 from .models import FriendRequest, Friendship, Follow
+from . import graph, suggestions
 
 @receiver(post_save, sender=FriendRequest)
 def handle_friend_request_accept(sender, instance, created, **kwargs):
@@ -16,8 +17,54 @@ def handle_friend_request_accept(sender, instance, created, **kwargs):
     elif instance.status == FriendRequest.STATUS_REJECTED:
         Follow.objects.filter(follower=instance.sender, following=instance.receiver).delete()
     
-@receiver(post_delete, sender=FriendRequest)
+@receiver(post_delete, sender=Friendship)
 def handle_friendship_delete(sender, instance, **kwargs):
     with transaction.atomic():
         Follow.objects.filter(follower=instance.user1, following=instance.user2).delete()
         Follow.objects.filter(follower=instance.user2, following=instance.user1).delete()
+
+
+@receiver(post_save, sender=Friendship)
+@receiver(post_delete, sender=Friendship)
+def invalidate_friends_graph(sender, instance, **kwargs):
+    graph.invalidate(graph.FRIENDS, [instance.user1_id, instance.user2_id])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_graph(sender, instance, **kwargs):
+    graph.invalidate(graph.FOLLOWINGS, [instance.follower_id])
+    graph.invalidate(graph.FOLLOWERS, [instance.following_id])
+
+
+@receiver(post_save, sender=Friendship)
+@receiver(post_delete, sender=Friendship)
+def queue_friend_suggestions(sender, instance, created=False, **kwargs):
+    # Новое или удалённое ребро меняет число общих друзей у друзей обоих концов
+    if created:
+        suggestions.discard(instance.user1_id, instance.user2_id)
+    ends = [instance.user1_id, instance.user2_id]
+    affected = set(ends)
+    for friend_ids in graph.friends_of_many(ends).values():
+        affected.update(friend_ids)
+    transaction.on_commit(lambda: suggestions.queue(affected))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def queue_follow_suggestions(sender, instance, **kwargs):
+    follower_id = instance.follower_id
+    transaction.on_commit(lambda: suggestions.queue([follower_id]))
+
+
+@receiver(post_save, sender=FriendRequest)
+def discard_requested_suggestion(sender, instance, created, **kwargs):
+    if created:
+        suggestions.discard(instance.sender_id, instance.receiver_id)
+
+
+@receiver(post_delete, sender=FriendRequest)
+def queue_cancelled_request(sender, instance, **kwargs):
+    # Отменённая заявка снова открывает пару для рекомендаций
+    pair = [instance.sender_id, instance.receiver_id]
+    transaction.on_commit(lambda: suggestions.queue(pair))
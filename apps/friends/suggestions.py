@@ -0,0 +1,176 @@
+"""Rekomendatsii "vozmozhno, vy znakomy".
+
+Kandidaty ranzhiruyutsya po chislu obshchih druzei i obshchih podpisok:
+
+    score = MUTUAL_WEIGHT * mutual_friends + SHARED_FOLLOW_WEIGHT * shared_follows
+
+Obshchie druz'ya - eto stroka matritsy A*A (A - matritsa smezhnosti
+druzhby), obshchie podpiski - stroka F*F^T. Oba proizvedeniya dlya paketa
+polzovatelei schitayutsya odnim INSERT ... SELECT s hesh-soedineniyami v
+Postgres: bez zaprosa na kazhdogo polzovatelya i bez vygruzki grafa v
+Python. Rezul'tat lezhit v FriendSuggestion, endpoint chitaet gotovyi
+spisok. Signaly stavyat zatronutyh polzovatelei v SuggestionQueue,
+manage.py refresh_friend_suggestions pereschityvaet ochered'.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import FriendRequest, Friendship, Follow, FriendSuggestion, SuggestionQueue
+
+User = get_user_model()
+
+REFRESH_SQL = """
+WITH first_hop AS (
+    SELECT f.user1_id AS user_id, f.user2_id AS friend_id
+    FROM {friendship} f WHERE f.user1_id = ANY(%(user_ids)s)
+    UNION ALL
+    SELECT f.user2_id, f.user1_id
+    FROM {friendship} f WHERE f.user2_id = ANY(%(user_ids)s)
+),
+mutual AS (
+    SELECT user_id, candidate_id, COUNT(*) AS n FROM (
+        SELECT h.user_id, f.user2_id AS candidate_id
+        FROM first_hop h JOIN {friendship} f ON f.user1_id = h.friend_id
+        UNION ALL
+        SELECT h.user_id, f.user1_id
+        FROM first_hop h JOIN {friendship} f ON f.user2_id = h.friend_id
+    ) paths
+    WHERE candidate_id <> user_id
+    GROUP BY user_id, candidate_id
+),
+shared AS (
+    SELECT mine.follower_id AS user_id, theirs.follower_id AS candidate_id, COUNT(*) AS n
+    FROM {follow} mine
+    JOIN {follow} theirs ON theirs.following_id = mine.following_id
+    WHERE mine.follower_id = ANY(%(user_ids)s)
+      AND theirs.follower_id <> mine.follower_id
+      -- Популярные аккаунты ничего не говорят о знакомстве и раздувают соединение
+      AND (SELECT COUNT(*) FROM {follow} c WHERE c.following_id = mine.following_id) <= %(fanout_cap)s
+    GROUP BY mine.follower_id, theirs.follower_id
+),
+scored AS (
+    SELECT
+        COALESCE(m.user_id, s.user_id) AS user_id,
+        COALESCE(m.candidate_id, s.candidate_id) AS candidate_id,
+        COALESCE(m.n, 0) AS mutual_friends,
+        COALESCE(s.n, 0) AS shared_follows
+    FROM mutual m
+    FULL OUTER JOIN shared s ON s.user_id = m.user_id AND s.candidate_id = m.candidate_id
+),
+ranked AS (
+    SELECT
+        sc.*,
+        sc.mutual_friends * %(mutual_weight)s + sc.shared_follows * %(follow_weight)s AS score,
+        ROW_NUMBER() OVER (
+            PARTITION BY sc.user_id
+            ORDER BY sc.mutual_friends * %(mutual_weight)s + sc.shared_follows * %(follow_weight)s DESC,
+                     sc.candidate_id
+        ) AS place
+    FROM scored sc
+    WHERE NOT EXISTS (
+        SELECT 1 FROM {friendship} f
+        WHERE f.user1_id = LEAST(sc.user_id, sc.candidate_id)
+          AND f.user2_id = GREATEST(sc.user_id, sc.candidate_id)
+    )
+    -- Заявка в любом статусе: ожидающая уже отправлена, отклонённую не навязываем снова
+    AND NOT EXISTS (
+        SELECT 1 FROM {friend_request} r
+        WHERE ((r.sender_id = sc.user_id AND r.receiver_id = sc.candidate_id)
+            OR (r.sender_id = sc.candidate_id AND r.receiver_id = sc.user_id))
+    )
+)
+INSERT INTO {suggestion} (user_id, candidate_id, mutual_friends, shared_follows, score, updated_at)
+SELECT user_id, candidate_id, mutual_friends, shared_follows, score, %(now)s
+FROM ranked
+WHERE place <= %(limit)s
+"""
+
+
+def _options():
+    return settings.FRIEND_SUGGESTIONS
+
+
+def queue(user_ids):
+    """Otmetit' rekomendatsii polzovatelei kak ustarevshie"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    now = timezone.now()
+    # Повторная постановка сдвигает queued_at: идущий пересчёт не снимет её с очереди
+    SuggestionQueue.objects.bulk_create(
+        [SuggestionQueue(user_id=user_id, queued_at=now) for user_id in user_ids],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['queued_at'],
+    )
+
+
+def refresh(user_ids):
+    """Pereschitat' rekomendatsii paketa polzovatelei odnim zaprosom"""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return 0
+    options = _options()
+    sql = REFRESH_SQL.format(
+        friendship=Friendship._meta.db_table,
+        follow=Follow._meta.db_table,
+        friend_request=FriendRequest._meta.db_table,
+        suggestion=FriendSuggestion._meta.db_table,
+    )
+    params = {
+        'user_ids': user_ids,
+        'fanout_cap': options['FOLLOW_FANOUT_CAP'],
+        'mutual_weight': float(options['MUTUAL_WEIGHT']),
+        'follow_weight': float(options['SHARED_FOLLOW_WEIGHT']),
+        'limit': options['LIMIT'],
+        'now': timezone.now(),
+    }
+    with transaction.atomic():
+        FriendSuggestion.objects.filter(user_id__in=user_ids).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+
+def refresh_queued(batch_size=None):
+    """Razobrat' ochered' paketami, vernut' chislo obrabotannyh polzovatelei"""
+    batch_size = batch_size or _options()['BATCH_SIZE']
+    processed = 0
+    while True:
+        batch = list(
+            SuggestionQueue.objects.order_by('queued_at').values_list('user_id', 'queued_at')[:batch_size]
+        )
+        if not batch:
+            return processed
+        with transaction.atomic():
+            refresh([user_id for user_id, _ in batch])
+            done = Q()
+            for user_id, queued_at in batch:
+                done |= Q(user_id=user_id, queued_at=queued_at)
+            SuggestionQueue.objects.filter(done).delete()
+        processed += len(batch)
+
+
+def refresh_all(batch_size=None):
+    """Polnyi pereschet vseh polzovatelei"""
+    batch_size = batch_size or _options()['BATCH_SIZE']
+    users = User.objects.order_by('pk').values_list('pk', flat=True)
+    processed = 0
+    last_id = 0
+    while True:
+        user_ids = list(users.filter(pk__gt=last_id)[:batch_size])
+        if not user_ids:
+            return processed
+        last_id = user_ids[-1]
+        refresh(user_ids)
+        processed += len(user_ids)
+
+
+def discard(user_id, candidate_id):
+    """Ubrat' paru iz rekomendatsii srazu (zayavka, druzhba), ne dozhidayas' pereschyota"""
+    FriendSuggestion.objects.filter(
+        Q(user_id=user_id, candidate_id=candidate_id) | Q(user_id=candidate_id, candidate_id=user_id)
+    ).delete()
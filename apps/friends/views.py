@@ -4,9 +4,16 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.db.models import Q
-from django.conf import settings
-from .models import FriendRequest, Friendship, Follow
-from .serializers import FriendRequestSerializer, FriendshipSerializer, FolloweSerializer
+from django.contrib.auth import get_user_model
+from .models import FriendRequest, Friendship, Follow, FriendSuggestion
+from .serializers import (
+    FriendRequestSerializer, FriendshipSerializer, FolloweSerializer, FriendSuggestionSerializer,
+)
+from . import graph
+from .relationships import relationships_of, MAX_IDS
+from .separation import shortest_path, BudgetExceeded
+
+User = get_user_model()
 
 
 class FriendRequestViewSet(viewsets.ModelViewSet):
@@ -50,17 +57,61 @@ class FriendshipViewSet(viewsets.ViewSet):
 
     def list(self, request):
         user = request.user
-        qs = Friendship.objects.filter(Q(user1=user) | Q(user2=user))
+        # Из БД, не из кеша графа: кеш процесса может отставать от записи.
+        # Два запроса по индексам user1/user2 вместо OR по обоим полям
+        qs = [
+            *Friendship.objects.filter(user2=user).select_related('user1', 'user2'),
+            *Friendship.objects.filter(user1=user).select_related('user1', 'user2'),
+        ]
         serializer = FriendshipSerializer(qs, many=True)
         return Response(serializer.data)
     
     @action(detail=True, methods=['delete'], url_path='remove')
     def remove_friend(self, request, pk=None):
-        friend = get_object_or_404(settings.AUTH_USER_MODEL, pk=pk)
-        Friendship.objects.filter(
-            Q(user1=request.user, user2=friend) | Q(user1=friend, user2=request.user)
-        ).delete()
+        friend = get_object_or_404(User, pk=pk)
+        # Без проверки по кешу: устаревший кеш превращал удаление в no-op
+        user1_id, user2_id = sorted((request.user.id, friend.id))
+        Friendship.objects.filter(user1_id=user1_id, user2_id=user2_id).delete()
+        graph.invalidate(graph.FRIENDS, [user1_id, user2_id])
         return Response({"detail": "Freind was removed"}, status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['get'], url_path='relationships')
+    def relationships(self, request):
+        raw = request.query_params.get('ids', '')
+        try:
+            user_ids = [int(value) for value in raw.split(',') if value.strip()]
+        except ValueError:
+            return Response({"detail": "ids must be a comma-separated list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(user_ids) > MAX_IDS:
+            return Response({"detail": f"At most {MAX_IDS} ids per request"}, status=status.HTTP_400_BAD_REQUEST)
+        data = relationships_of(request.user.id, user_ids)
+        return Response({str(user_id): item for user_id, item in data.items()})
+
+    @action(detail=False, methods=['get'], url_path=r'path/(?P<user_id>\d+)')
+    def path(self, request, user_id=None):
+        target = get_object_or_404(User, pk=user_id)
+        try:
+            max_depth = int(request.query_params.get('max_depth', 0)) or None
+        except ValueError:
+            return Response({"detail": "max_depth must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = shortest_path(request.user.id, target.id, max_depth=max_depth)
+        except BudgetExceeded:
+            return Response({"detail": "Search budget exceeded"}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if ids is None:
+            return Response({"detail": "No path within depth limit", "path": None, "degrees": None})
+        users = User.objects.in_bulk(ids)
+        path = [{'id': pk, 'username': users[pk].username} for pk in ids if pk in users]
+        return Response({"path": path, "degrees": len(ids) - 1})
+
+    @action(detail=False, methods=['get'], url_path='suggestions')
+    def suggestions(self, request):
+        qs = FriendSuggestion.objects.filter(user=request.user).select_related('candidate')
+        friend_ids = graph.friends_of(request.user.id)
+        # Дружба, появившаяся после пересчёта, отсеивается без ожидания очереди
+        items = [s for s in qs if not graph.contains(friend_ids, s.candidate_id)]
+        serializer = FriendSuggestionSerializer(items, many=True)
+        return Response(serializer.data)
     
 class FollowViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
@@ -77,7 +128,7 @@ class FollowViewSet(viewsets.ViewSet):
         return Response(serializer.data)
     @action(detail=True, methods=['delete'], url_path='unfollow')
     def unfollow(self, request, pk=None):
-        user_to_unfollow = get_object_or_404(settings.AUTH_USER_MODEL, pk=pk)
+        user_to_unfollow = get_object_or_404(User, pk=pk)
         Follow.objects.filter(follower=request.user, following=user_to_unfollow).delete()
         return Response({"detail": "Unfollow successfully"}, status=status.HTTP_204_NO_CONTENT)
     
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""Asinhronnaya obrabotka zagruzhennyh izobrazhenii.
+
+Posle kommita modeli s novym izobrazheniem original otpravlyaetsya v pul
+protsessov, gde Pillow delaet umen'shennye perekodirovannye varianty.
+Rezul'tat sohranyaetsya pod imenami iz hesha soderzhimogo (odinakovye
+kartinki ne dubliruyutsya, imena mozhno keshirovat' vechno), a imena
+faylov zapisyvayutsya v JSON-pole modeli. Potok zaprosa ne zhdet nichego,
+krome postanovki v ochered'.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+
+from .render import render_variants
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: дочерним процессам не достаются потоки и соединения сервера
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.IMAGE_PIPELINE['WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+    return _executor
+
+
+def watch(model, image_field, variants_field):
+    """Podpisat' model': pri smene izobrazheniya stroit' varianty v fone"""
+
+    def schedule_variants(sender, instance, **kwargs):
+        image = getattr(instance, image_field)
+        variants = getattr(instance, variants_field) or {}
+        if not image:
+            if variants:
+                model.objects.filter(pk=instance.pk).update(**{variants_field: {}})
+            return
+        if variants.get('source') == image.name:
+            return
+        transaction.on_commit(
+            lambda: submit(model, instance.pk, image_field, variants_field, image.name)
+        )
+
+    post_save.connect(
+        schedule_variants,
+        sender=model,
+        weak=False,
+        dispatch_uid=f'images:{model._meta.label}:{image_field}',
+    )
+
+
+def submit(model, pk, image_field, variants_field, source_name):
+    options = settings.IMAGE_PIPELINE
+    if not options['ENABLED']:
+        return
+    try:
+        with default_storage.open(source_name) as source:
+            data = source.read()
+    except OSError:
+        logger.warning('Image %s is missing, variants skipped', source_name)
+        return
+
+    future = _get_executor().submit(
+        render_variants, data, options['VARIANTS'], options['FORMAT'], options['QUALITY'],
+    )
+    future.add_done_callback(
+        lambda done: _store(done, model, pk, image_field, variants_field, source_name)
+    )
+
+
+def _store(future, model, pk, image_field, variants_field, source_name):
+    """Vypolnyaetsya v sluzhebnom potoke pula: sohranit' fayly i obnovit' model'"""
+    try:
+        rendered = future.result()
+        extension = EXTENSIONS[settings.IMAGE_PIPELINE['FORMAT']]
+        directory = os.path.join(os.path.dirname(source_name), 'variants')
+        variants = {'source': source_name}
+        for name, content in rendered.items():
+            digest = hashlib.sha256(content).hexdigest()[:32]
+            path = os.path.join(directory, f'{digest}.{extension}')
+            if not default_storage.exists(path):
+                path = default_storage.save(path, ContentFile(content))
+            variants[name] = path
+        # Если картинку успели заменить, эти варианты уже не нужны
+        model.objects.filter(pk=pk, **{image_field: source_name}).update(**{variants_field: variants})
+    except Exception:
+        logger.exception('Image variants failed for %s', source_name)
+    finally:
+        close_old_connections()
+
+
+def variant_urls(variants, request=None):
+    """{imya: absolyutnyi URL} dlya otdachi klientu"""
+    urls = {}
+    for name, path in (variants or {}).items():
+        if name == 'source':
+            continue
+        url = default_storage.url(path)
+        urls[name] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,28 @@
+"""Resaiz i perekodirovanie izobrazhenii.
+
+Modul' ne zavisit ot Django: on vypolnyaetsya v dochernih protsessah
+pula (apps.images.pipeline), kotorym ne nuzhen django.setup().
+"""
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+
+def render_variants(data, sizes, image_format, quality):
+    """Vernut' {imya_varianta: bytes} dlya kazhdogo razmera (dlinnaya storona v px)"""
+    with Image.open(BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        if image_format == 'JPEG' and image.mode == 'RGBA':
+            image = image.convert('RGB')
+
+        variants = {}
+        for name, size in sizes.items():
+            variant = image.copy()
+            # thumbnail() не увеличивает картинку и сохраняет пропорции
+            variant.thumbnail((size, size), Image.LANCZOS)
+            buffer = BytesIO()
+            variant.save(buffer, format=image_format, quality=quality, optimize=True)
+            variants[name] = buffer.getvalue()
+        return variants
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:29
+
+from django.db import migrations
+
+from apps.api.partitions import convert_to_partitioned
+
+
+def partition_notifications(apps, schema_editor):
+    convert_to_partitioned(schema_editor, 'notifications_notification')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_alter_notification_type'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_notifications, migrations.RunPython.noop),
+    ]
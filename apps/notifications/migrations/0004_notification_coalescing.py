@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:29
+
+import django.contrib.postgres.fields
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_updated_at(apps, schema_editor):
+    schema_editor.execute('UPDATE notifications_notification SET updated_at = created_at')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_partition_notifications'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='notification',
+            options={'ordering': ['-updated_at', '-id'], 'verbose_name': 'Уведомление', 'verbose_name_plural': 'Уведомления'},
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='group_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='recent_actors',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-updated_at', '-id'], name='notificatio_recipie_d62bbf_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('recipient', 'group_key', 'created_at'), name='unique_notification_group'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+def fill_first_activity_at(apps, schema_editor):
+    # Для уже свёрнутых рядов точное время первого события неизвестно — берём начало окна
+    schema_editor.execute(
+        'UPDATE notifications_notification SET first_activity_at = created_at WHERE group_key IS NOT NULL'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notification_coalescing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='first_activity_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_first_activity_at, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.fields import ArrayField
 
 User = get_user_model()
 
@@ -41,16 +42,35 @@ class Notification(models.Model):
     content_object = GenericForeignKey('content_type', 'object_id')
 
     is_read = models.BooleanField(default=False)
+    # У свёрнутых уведомлений здесь начало окна: это ключ секционирования,
+    # и он обязан входить в уникальный ключ свёртки. Реальное время — first_activity_at
     created_at = models.DateTimeField(default=timezone.now)
 
+    # Свёрнутые уведомления: один ряд на (тип, объект, окно времени)
+    group_key = models.CharField(max_length=100, null=True, blank=True, editable=False)
+    first_activity_at = models.DateTimeField(null=True, blank=True, editable=False)
+    actor_count = models.PositiveIntegerField(default=1)
+    recent_actors = ArrayField(models.BigIntegerField(), default=list, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
     class Meta:
         verbose_name = 'Уведомление'
         verbose_name_plural = 'Уведомления'
-        ordering = ['-created_at']
+        ordering = ['-updated_at', '-id']
         indexes = [
             models.Index(fields=['recipient', 'is_read']),
             models.Index(fields=['recipient', '-created_at']),
+            models.Index(fields=['recipient', '-updated_at', '-id']),  # список по последней активности
+        ]
+        constraints = [
+            # created_at входит в ключ: таблица секционирована по нему
+            models.UniqueConstraint(fields=['recipient', 'group_key', 'created_at'], name='unique_notification_group'),
         ]
 
+    @property
+    def occurred_at(self):
+        """Vremya pervogo sobytiya: dlya svernutyh created_at - nachalo okna"""
+        return self.first_activity_at or self.created_at
+
     def __str__(self):
         return f'{self.sender} -> {self.recipient} ({self.type})'
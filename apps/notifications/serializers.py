@@ -18,10 +18,15 @@ class NotificationSerializer(serializers.ModelSerializer):
     sender = SenderSerializer(read_only=True)
     recipient = SenderSerializer(read_only=True)
     content_object_str = serializers.SerializerMethodField()
+    # Для свёрнутых уведомлений колонка created_at — начало окна; наружу отдаём реальное время
+    created_at = serializers.DateTimeField(source='occurred_at', read_only=True)
 
     class Meta:
         model = Notification
-        fields = ['id', 'type', 'sender', 'recipient', 'content_object_str', 'is_read', 'created_at']
+        fields = [
+            'id', 'type', 'sender', 'recipient', 'content_object_str', 'is_read',
+            'actor_count', 'recent_actors', 'created_at', 'updated_at',
+        ]
 
     def get_content_object_str(self, obj):
         if obj.content_object:
@@ -1,5 +1,33 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.utils import timezone
+
 from .models import Notification
 
+# Один ряд на (получатель, group_key, начало окна); новый актор увеличивает
+# счётчик и встаёт первым в recent_actors — атомарно, без чтения ряда.
+COALESCE_SQL = """
+INSERT INTO {table} (
+    recipient_id, sender_id, type, content_type_id, object_id, is_read,
+    created_at, first_activity_at, updated_at, group_key, actor_count, recent_actors
+)
+VALUES (%(recipient)s, %(sender)s, %(type)s, %(content_type)s, %(object_id)s, false,
+        %(window)s, %(now)s, %(now)s, %(group_key)s, 1, ARRAY[%(sender)s]::bigint[])
+ON CONFLICT (recipient_id, group_key, created_at) DO UPDATE SET
+    sender_id = EXCLUDED.sender_id,
+    is_read = false,
+    updated_at = EXCLUDED.updated_at,
+    actor_count = {table}.actor_count
+        + CASE WHEN EXCLUDED.sender_id = ANY({table}.recent_actors) THEN 0 ELSE 1 END,
+    recent_actors = (
+        array_prepend(EXCLUDED.sender_id, array_remove({table}.recent_actors, EXCLUDED.sender_id))
+    )[1:%(recent)s]
+RETURNING {columns}
+"""
+
 # def create_notification(recipient, sender, type, content_object=None):
 #     if recipient == sender:
 #         return
@@ -12,14 +40,51 @@ from .models import Notification
 #     )
 #     return notification
 
-def create_notification(recipient, sender, type, content_object=None):
-    """Создать уведомление если не существует"""
+def _window_start(now, window):
+    """Начало окна свёртки: фиксированные интервалы от эпохи"""
+    seconds = int(now.timestamp()) // window * window
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def coalesce_notification(recipient, sender, type, content_object):
+    """Upsert свёрнутого уведомления, вернуть его (Notification из RETURNING, без второго запроса)"""
+    options = settings.NOTIFICATION_COALESCING
+    content_type = ContentType.objects.get_for_model(content_object)
+    now = timezone.now()
+    window = _window_start(now, options['WINDOW'])
+    params = {
+        'recipient': recipient.pk,
+        'sender': sender.pk,
+        'type': type,
+        'content_type': content_type.pk,
+        'object_id': content_object.pk,
+        'window': window,
+        'now': now,
+        'group_key': f'{type}:{content_type.pk}:{content_object.pk}',
+        'recent': options['RECENT_ACTORS'],
+    }
+    fields = Notification._meta.concrete_fields
+    sql = COALESCE_SQL.format(
+        table=Notification._meta.db_table,
+        columns=', '.join(f'{Notification._meta.db_table}.{field.column}' for field in fields),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return Notification.from_db(connection.alias, [field.attname for field in fields], row)
+
+
+def create_notification(recipient, sender, type, content_object=None, deduplicate=True):
+    """Создать уведомление если не существует (deduplicate=False — заведомо
+    новый объект, например только что созданное сообщение: сразу INSERT).
+    Типы из NOTIFICATION_COALESCING['TYPES'] сворачиваются в один ряд"""
     if recipient == sender:
         return None
+
+    if content_object is not None and sender is not None and type in settings.NOTIFICATION_COALESCING['TYPES']:
+        return coalesce_notification(recipient, sender, type, content_object)
     
     # Используем get_or_create для избежания дубликатов
-    from django.contrib.contenttypes.models import ContentType
-    
     kwargs = {
         'recipient': recipient,
         'sender': sender,
@@ -30,5 +95,7 @@ def create_notification(recipient, sender, type, content_object=None):
         kwargs['content_type'] = ContentType.objects.get_for_model(content_object)
         kwargs['object_id'] = content_object.id
     
+    if not deduplicate:
+        return Notification.objects.create(**kwargs)
     notification, created = Notification.objects.get_or_create(**kwargs)
     return notification
\ No newline at end of file
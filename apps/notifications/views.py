@@ -4,11 +4,14 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Notification
 from .serializers import NotificationSerializer
+from apps.api.pagination import NotificationKeysetPagination
+from apps.api import partitions
 
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationKeysetPagination
 
     def get_queryset(self):
         return Notification.objects.filter(recipient=self.request.user,).select_related('sender', 'recipient')
@@ -26,4 +29,30 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         """Otmetit vse uvedomleniya kak prochtenye"""
         updated = Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
         return Response({'detail': f'Noted {updated} notifications'}, status=status.HTTP_200_OK)
-    
+
+    @action(detail=False, methods=['get'], url_path='history')
+    def history(self, request):
+        """Arhiv uvedomlenii iz otsoedinennyh sektsii: bez month - spisok mesyatsev"""
+        table = Notification._meta.db_table
+        month = request.query_params.get('month')
+        if not month:
+            months = partitions.archived_months(table, request.user.id)
+            return Response({'months': [f'{m:%Y-%m}' for m in months]})
+        try:
+            month = partitions.parse_month(month)
+        except ValueError:
+            return Response({'detail': 'month must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+        rows = partitions.read_archive(table, month, request.user.id)
+        results = [
+            {
+                'id': int(row['id']),
+                'type': row['type'],
+                'sender': int(row['sender_id']) if row['sender_id'] else None,
+                'object_id': int(row['object_id']) if row['object_id'] else None,
+                'is_read': row['is_read'] == 't',
+                # как в NotificationSerializer: у свёрнутых created_at — начало окна
+                'created_at': row.get('first_activity_at') or row['created_at'],
+            }
+            for row in rows
+        ]
+        return Response({'month': f'{month:%Y-%m}', 'results': results})
@@ -1,21 +1,44 @@
 from django.contrib import admin
+from django.db.models import Q
 from .models import Post, Like, Comment
+from .search import make_query
+
+
+class SearchVectorAdminMixin:
+    """Poisk v adminke po GIN-indeksu search_vector vmesto ILIKE '%..%'"""
+
+    search_vector_path = 'search_vector'
+    search_username_path = None
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        condition = Q(**{self.search_vector_path: make_query(search_term)})
+        if self.search_username_path:
+            condition |= Q(**{self.search_username_path: search_term})
+        return queryset.filter(condition), False
+
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
-    list_display = ['author', 'short_text', 'is_public', 'created_at']
+class PostAdmin(SearchVectorAdminMixin, admin.ModelAdmin):
+    list_display = ['author', 'short_text', 'is_public', 'likes_count', 'comments_count', 'created_at']
     search_fields = ['text', 'author__username']
+    search_username_path = 'author__username'
     list_filter = ['is_public', 'created_at']
 
 @admin.register(Like)
-class LikeAdmin(admin.ModelAdmin):
+class LikeAdmin(SearchVectorAdminMixin, admin.ModelAdmin):
     list_display = ['user', 'post', 'created_at']
-    search_fields = ['user__name', 'post__text']
+    search_fields = ['user__username', 'post__text']
+    search_vector_path = 'post__search_vector'
+    search_username_path = 'user__username'
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(SearchVectorAdminMixin, admin.ModelAdmin):
     list_display = ['user', 'post', 'short_text', 'created_at']
-    search_fields = ['user__username', 'post__text']
+    search_fields = ['user__username', 'text']
+    search_username_path = 'user__username'
 
     def short_text(self, obj):
-        return obj.text[:20] + ('...' if len(obj.text) > 20 else '') 
\ No newline at end of file
+        return obj.text[:20] + ('...' if len(obj.text) > 20 else '')
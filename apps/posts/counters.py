@@ -0,0 +1,57 @@
+"""Denormalizovannye schetchiki Post.likes_count / Post.comments_count.
+
+Schetchiki menyayutsya atomarnym UPDATE ... SET x = x + 1 v toi zhe
+tranzaktsii, chto i Like/Comment; reconcile() chinit rashozhdeniya paketom.
+Lyuboe izmenenie otmechaetsya v engagement_changed_at - po nemu
+ranking.update_scores nahodit posty dlya pereschyota skora, v tom chisle
+posle udaleniya laikov i kommentariev.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Now
+
+from .models import Post, Like, Comment
+
+
+def increment(post_id, field, delta=1):
+    Post.objects.filter(pk=post_id).update(
+        **{field: Greatest(F(field) + delta, Value(0))},
+        engagement_changed_at=Now(),
+    )
+
+
+def _count_subquery(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(post_id=OuterRef('pk'))
+            .order_by()
+            .values('post_id')
+            .annotate(total=Count('id'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def reconcile(post_ids=None, batch_size=1000):
+    """Pereschitat' rasoshedshiesya schetchiki, vozvrashchaet chislo ispravlennyh postov"""
+    posts = Post.objects.all() if post_ids is None else Post.objects.filter(pk__in=post_ids)
+    posts = posts.order_by('pk')
+
+    fixed = 0
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return fixed
+        last_pk = batch[-1]
+        fixed += Post.objects.filter(pk__in=batch).annotate(
+            actual_likes=_count_subquery(Like),
+            actual_comments=_count_subquery(Comment),
+        ).filter(
+            ~Q(likes_count=F('actual_likes')) | ~Q(comments_count=F('actual_comments'))
+        ).update(
+            likes_count=_count_subquery(Like),
+            comments_count=_count_subquery(Comment),
+            engagement_changed_at=Now(),
+        )
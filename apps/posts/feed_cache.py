@@ -0,0 +1,121 @@
+"""Kesh otvetov /posts/feed/ s versiyami po polzovatelyam.
+
+Klyuch stranitsy: feed:<user>:<versiya>:<hash query string>. Lyuboe
+sobytie, menyayushchee lentu polzovatelya (post vidimogo avtora, ego
+pravka ili udalenie, izmenenie druzei/podpisok), menyaet versiyu, i
+starye stranitsy prosto perestayut chitat'sya i vytesnyayutsya po TTL.
+Schetchiki laikov i kommentariev v stranitse ne doveryayutsya keshu i
+obnovlyayutsya pri kazhdom popadanii (refresh_counters).
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+HITS_KEY = 'feed:stats:hits'
+MISSES_KEY = 'feed:stats:misses'
+
+
+def _cache():
+    return caches[settings.FEED_CACHE['ALIAS']]
+
+
+def _version_key(user_id):
+    return f'feed:v:{user_id}'
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def enabled():
+    return settings.FEED_CACHE['ENABLED']
+
+
+def version(user_id):
+    cache = _cache()
+    current = cache.get(_version_key(user_id))
+    if current is None:
+        current = _new_version()
+        # add(), а не set(): параллельный запрос мог уже выставить версию
+        if not cache.add(_version_key(user_id), current, timeout=None):
+            current = cache.get(_version_key(user_id), current)
+    return current
+
+
+def bump(user_ids):
+    """Sdelat' nedeistvitel'nymi vse zakeshirovannye stranitsy lenty polzovatelei"""
+    if not enabled() or not user_ids:
+        return
+    _cache().set_many({_version_key(uid): _new_version() for uid in user_ids}, timeout=None)
+
+
+def page_key(request):
+    query = request.META.get('QUERY_STRING', '')
+    digest = hashlib.md5(query.encode()).hexdigest()
+    return f'feed:{request.user.pk}:{version(request.user.pk)}:{digest}'
+
+
+def lookup(key):
+    data = _cache().get(key)
+    _count(HITS_KEY if data is not None else MISSES_KEY)
+    return data
+
+
+def store(key, data):
+    _cache().set(key, data, timeout=settings.FEED_CACHE['TIMEOUT'])
+
+
+def refresh_counters(data):
+    """Podstavit' svezhie schetchiki v zakeshirovannuyu stranitsu.
+
+    Schetchiki menyayutsya s kazhdym laikom; sbros versii lent vsei
+    auditorii avtora na kazhdyi laik stoil by O(podpischikov), poetomu
+    oni chitayutsya zanovo odnim zaprosom po pk na stranitsu.
+    """
+    from .like_buffer import pending_deltas
+    from .models import Post
+
+    items = data.get('results', [])
+    post_ids = [item['id'] for item in items]
+    if not post_ids:
+        return data
+    counts = {
+        pk: (likes, comments)
+        for pk, likes, comments in Post.objects.filter(pk__in=post_ids).values_list(
+            'pk', 'likes_count', 'comments_count'
+        )
+    }
+    deltas = pending_deltas(post_ids)
+    for item in items:
+        if item['id'] in counts:
+            likes, comments = counts[item['id']]
+            item['likes_count'] = max(likes + deltas.get(item['id'], 0), 0)
+            item['comment_count'] = comments
+    return data
+
+
+def _count(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def stats():
+    values = _cache().get_many([HITS_KEY, MISSES_KEY])
+    hits = values.get(HITS_KEY, 0)
+    misses = values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    _cache().delete_many([HITS_KEY, MISSES_KEY])
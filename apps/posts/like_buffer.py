@@ -0,0 +1,344 @@
+"""Buferizovannye laiki dlya virusnyh postov.
+
+Pereklyuchenie laika zapisyvaetsya v bystryi bufer (pamyat' protsessa ili
+lokal'nyi Redis), a ne v tablitsu Like. Periodicheskii flush() perenosit
+nakoplennoe v Like paketami i pereschityvaet Post.likes_count odnim
+UPDATE na post.
+
+Dlya kazhdogo posta bufer hranit:
+  * pending  - poslednee sostoyanie laika po polzovatelyam (user_id -> bool)
+  * inflight - to zhe, uzhe vzyatoe flush()'em, no eshche ne zakommichennoe
+  * delta    - naskol'ko effektivnoe chislo laikov otlichaetsya ot Post.likes_count
+
+Chtenie sostoyaniya smotrit pending -> inflight -> tablitsu, poetomu
+polzovatel' vsegda vidit svoi sobstvennye pereklyucheniya.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+from .models import Post, Like
+from . import counters, feed_cache
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+class BaseLikeBuffer:
+    """Interfeis bufera; vse metody atomarny otnositel'no drug druga"""
+
+    #: flush() nuzhno vyzyvat' v tom zhe protsesse (bufer v pamyati)
+    in_process = False
+
+    def toggle(self, post_id, user_id, durable_liked):
+        """Pereklyuchit' laik, vernut' novoe sostoyanie"""
+        raise NotImplementedError
+
+    def states(self, user_id, post_ids):
+        """Nezakommichennye sostoyaniya laikov polzovatelya: {post_id: bool}"""
+        raise NotImplementedError
+
+    def deltas(self, post_ids):
+        """Popravki k Post.likes_count: {post_id: int}"""
+        raise NotImplementedError
+
+    def begin_flush(self, limit):
+        """Perenesti pending v inflight dlya <= limit postov, vernut' {post_id: {user_id: bool}}"""
+        raise NotImplementedError
+
+    def end_flush(self, post_ids):
+        """Zabyt' inflight posle uspeshnogo kommita"""
+        raise NotImplementedError
+
+
+class LocalLikeBuffer(BaseLikeBuffer):
+    """Bufer v pamyati protsessa (odin vorker / razrabotka)"""
+
+    in_process = True
+
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(dict)
+        self._inflight = defaultdict(dict)
+        self._pending_delta = defaultdict(int)
+        self._inflight_delta = defaultdict(int)
+
+    def _state(self, post_id, user_id):
+        if user_id in self._pending.get(post_id, ()):
+            return self._pending[post_id][user_id]
+        return self._inflight.get(post_id, {}).get(user_id)
+
+    def toggle(self, post_id, user_id, durable_liked):
+        with self._lock:
+            current = self._state(post_id, user_id)
+            liked = not (durable_liked if current is None else current)
+            self._pending[post_id][user_id] = liked
+            self._pending_delta[post_id] += 1 if liked else -1
+            return liked
+
+    def states(self, user_id, post_ids):
+        with self._lock:
+            result = {}
+            for post_id in post_ids:
+                state = self._state(post_id, user_id)
+                if state is not None:
+                    result[post_id] = state
+            return result
+
+    def deltas(self, post_ids):
+        with self._lock:
+            return {
+                post_id: self._pending_delta.get(post_id, 0) + self._inflight_delta.get(post_id, 0)
+                for post_id in post_ids
+                if post_id in self._pending_delta or post_id in self._inflight_delta
+            }
+
+    def begin_flush(self, limit):
+        with self._lock:
+            batch = {}
+            for post_id in list(self._inflight)[:limit]:
+                batch[post_id] = dict(self._inflight[post_id])
+            for post_id in list(self._pending)[:max(limit - len(batch), 0)]:
+                states = self._pending.pop(post_id)
+                self._inflight[post_id].update(states)
+                self._inflight_delta[post_id] += self._pending_delta.pop(post_id, 0)
+                batch[post_id] = dict(self._inflight[post_id])
+            return batch
+
+    def end_flush(self, post_ids):
+        with self._lock:
+            for post_id in post_ids:
+                self._inflight.pop(post_id, None)
+                self._inflight_delta.pop(post_id, None)
+
+
+class RedisLikeBuffer(BaseLikeBuffer):
+    """Bufer v lokal'nom Redis, obshchii dlya vseh vorkerov"""
+
+    TOGGLE = """
+    local state = redis.call('HGET', KEYS[1], ARGV[1])
+    if not state then state = redis.call('HGET', KEYS[2], ARGV[1]) end
+    if not state then state = ARGV[2] end
+    local liked = state == '0' and '1' or '0'
+    redis.call('HSET', KEYS[1], ARGV[1], liked)
+    redis.call('HINCRBY', KEYS[3], ARGV[3], liked == '1' and 1 or -1)
+    redis.call('SADD', KEYS[4], ARGV[3])
+    return liked
+    """
+
+    # pending -> inflight; pending perezapisyvaet inflight, delty skladyvayutsya
+    BEGIN = """
+    local states = redis.call('HGETALL', KEYS[1])
+    for i = 1, #states, 2 do
+        redis.call('HSET', KEYS[2], states[i], states[i + 1])
+    end
+    redis.call('DEL', KEYS[1])
+    local delta = redis.call('HGET', KEYS[3], ARGV[1])
+    if delta then
+        redis.call('HINCRBY', KEYS[4], ARGV[1], delta)
+        redis.call('HDEL', KEYS[3], ARGV[1])
+    end
+    redis.call('SREM', KEYS[5], ARGV[1])
+    redis.call('SADD', KEYS[6], ARGV[1])
+    return redis.call('HGETALL', KEYS[2])
+    """
+
+    def __init__(self, location='redis://127.0.0.1:6379/1', prefix='likes', **options):
+        import redis
+
+        self.client = redis.Redis.from_url(location)
+        self.prefix = prefix
+        self._toggle = self.client.register_script(self.TOGGLE)
+        self._begin = self.client.register_script(self.BEGIN)
+
+    def _key(self, *parts):
+        return ':'.join([self.prefix, *map(str, parts)])
+
+    def toggle(self, post_id, user_id, durable_liked):
+        liked = self._toggle(
+            keys=[
+                self._key('pending', post_id),
+                self._key('inflight', post_id),
+                self._key('delta'),
+                self._key('dirty'),
+            ],
+            args=[user_id, '1' if durable_liked else '0', post_id],
+        )
+        return liked == b'1'
+
+    def states(self, user_id, post_ids):
+        pipe = self.client.pipeline(transaction=False)
+        for post_id in post_ids:
+            pipe.hget(self._key('pending', post_id), user_id)
+            pipe.hget(self._key('inflight', post_id), user_id)
+        values = pipe.execute()
+        result = {}
+        for i, post_id in enumerate(post_ids):
+            state = values[2 * i] or values[2 * i + 1]
+            if state is not None:
+                result[post_id] = state == b'1'
+        return result
+
+    def deltas(self, post_ids):
+        if not post_ids:
+            return {}
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hmget(self._key('delta'), post_ids)
+        pipe.hmget(self._key('inflight-delta'), post_ids)
+        pending, inflight = pipe.execute()
+        result = {}
+        for post_id, a, b in zip(post_ids, pending, inflight):
+            if a is not None or b is not None:
+                result[post_id] = int(a or 0) + int(b or 0)
+        return result
+
+    def begin_flush(self, limit):
+        # Сначала — посты, чей прошлый flush не дошёл до end_flush (повтор).
+        post_ids = [int(p) for p in self.client.srandmember(self._key('flushing'), limit)]
+        if len(post_ids) < limit:
+            post_ids += [int(p) for p in self.client.srandmember(self._key('dirty'), limit - len(post_ids))]
+        batch = {}
+        for post_id in dict.fromkeys(post_ids):
+            flat = self._begin(
+                keys=[
+                    self._key('pending', post_id),
+                    self._key('inflight', post_id),
+                    self._key('delta'),
+                    self._key('inflight-delta'),
+                    self._key('dirty'),
+                    self._key('flushing'),
+                ],
+                args=[post_id],
+            )
+            batch[post_id] = {
+                int(flat[i]): flat[i + 1] == b'1' for i in range(0, len(flat), 2)
+            }
+        return batch
+
+    def end_flush(self, post_ids):
+        if not post_ids:
+            return
+        pipe = self.client.pipeline()
+        for post_id in post_ids:
+            pipe.delete(self._key('inflight', post_id))
+        pipe.hdel(self._key('inflight-delta'), *post_ids)
+        pipe.srem(self._key('flushing'), *post_ids)
+        pipe.execute()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+_flusher = None
+
+
+def enabled():
+    return settings.LIKE_BUFFER['ENABLED']
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                options = settings.LIKE_BUFFER
+                _buffer = import_string(options['BACKEND'])(**options.get('OPTIONS', {}))
+    return _buffer
+
+
+def toggle(post, user):
+    """Pereklyuchit' laik cherez bufer, vernut' (liked, likes_count)"""
+    buffer = get_buffer()
+    state = buffer.states(user.pk, [post.pk]).get(post.pk)
+    durable = state if state is not None else Like.objects.filter(post=post, user=user).exists()
+    liked = buffer.toggle(post.pk, user.pk, durable)
+    if buffer.in_process:
+        _ensure_flusher()
+    delta = buffer.deltas([post.pk]).get(post.pk, 0)
+    return liked, max(post.likes_count + delta, 0)
+
+
+def pending_states(user_id, post_ids):
+    if not enabled() or not post_ids:
+        return {}
+    return get_buffer().states(user_id, list(post_ids))
+
+
+def pending_deltas(post_ids):
+    if not enabled() or not post_ids:
+        return {}
+    return get_buffer().deltas(list(post_ids))
+
+
+def flush(limit=None):
+    """Perenesti nakoplennye laiki v tablitsu Like, vernut' chislo postov"""
+    from apps.notifications.utils import create_notification
+
+    buffer = get_buffer()
+    batch = buffer.begin_flush(limit or settings.LIKE_BUFFER['FLUSH_BATCH'])
+    if not batch:
+        return 0
+
+    with transaction.atomic():
+        posts = Post.objects.select_related('author').in_bulk(list(batch))
+        for post_id, states in batch.items():
+            post = posts.get(post_id)
+            if post is None:  # пост удалён, пока лайки лежали в буфере
+                continue
+            liked = [user_id for user_id, state in states.items() if state]
+            unliked = [user_id for user_id, state in states.items() if not state]
+
+            existing = set(
+                Like.objects.filter(post=post, user_id__in=liked).values_list('user_id', flat=True)
+            )
+            new_likes = [user_id for user_id in liked if user_id not in existing]
+            new_likes = list(User.objects.filter(pk__in=new_likes).values_list('pk', flat=True))
+            Like.objects.bulk_create(
+                [Like(post=post, user_id=user_id) for user_id in new_likes],
+                ignore_conflicts=True,
+            )
+            if unliked:
+                Like.objects.filter(post=post, user_id__in=unliked).delete()
+
+            for user_id in new_likes:
+                create_notification(recipient=post.author, sender=User(pk=user_id), type='like', content_object=post)
+
+        counters.reconcile(list(posts))
+
+        if feed_cache.enabled():
+            # bulk_create не шлёт сигналы: сбросить ленты лайкнувших (liked_by_me)
+            likers = {user_id for states in batch.values() for user_id in states}
+            transaction.on_commit(lambda: feed_cache.bump(likers))
+
+    buffer.end_flush(list(batch))
+    return len(batch)
+
+
+def _ensure_flusher():
+    """Dlya bufera v pamyati flush idet v fonovom potoke etogo zhe protsessa"""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _buffer_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=run_flusher, name='like-buffer-flusher', daemon=True)
+            _flusher.start()
+
+
+def run_flusher(interval=None):
+    interval = interval or settings.LIKE_BUFFER['FLUSH_INTERVAL']
+    while True:
+        time.sleep(interval)
+        try:
+            while flush():
+                pass
+        except Exception:
+            # Взятые посты остаются во inflight и попадут в следующий flush.
+            logger.exception('Like buffer flush failed')
+        finally:
+            close_old_connections()
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.posts import feed_cache
+
+
+class Command(BaseCommand):
+    help = 'Pokazat\' hit-rate kesha lenty'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Obnulit\' schetchiki posle vyvoda')
+
+    def handle(self, *args, **options):
+        stats = feed_cache.stats()
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} hit_rate={stats['hit_rate']:.2%}"
+        )
+        if options['reset']:
+            feed_cache.reset_stats()
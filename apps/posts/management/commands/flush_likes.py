@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.posts import like_buffer
+
+
+class Command(BaseCommand):
+    help = 'Perenesti buferizovannye laiki v tablitsu Like'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Rabotat\' postoyanno s intervalom LIKE_BUFFER["FLUSH_INTERVAL"]')
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            like_buffer.run_flusher()
+            return
+        flushed = 0
+        while True:
+            posts = like_buffer.flush()
+            if not posts:
+                break
+            flushed += posts
+        self.stdout.write(self.style.SUCCESS(f'Flushed likes for {flushed} posts'))
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.posts import timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Perestroit\' materializovannye lenty iz Friendship/Follow i postov'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='ID polzovatelya (mozhno neskol\'ko raz); po umolchaniyu vse')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids'] or User.objects.values_list('id', flat=True).iterator()
+        rebuilt = 0
+        for user_id in user_ids:
+            with transaction.atomic():
+                timeline.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} timelines'))
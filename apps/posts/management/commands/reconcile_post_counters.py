@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Pereschitat\' rasoshedshiesya Post.likes_count i Post.comments_count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post', type=int, action='append', dest='post_ids',
+                            help='ID posta (mozhno neskol\'ko raz); po umolchaniyu vse')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile(options['post_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Fixed counters on {fixed} posts'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from apps.posts import ranking
+
+
+class Command(BaseCommand):
+    help = 'Inkremental\'no pereschitat\' skory ranzhirovannoi lenty'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='ISO-vremya; po umolchaniyu s proshlogo zapuska')
+        parser.add_argument('--all', action='store_true', help='Pereschitat\' vse zapisi lent')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            updated = ranking.rescore(Q())
+        else:
+            since = parse_datetime(options['since']) if options['since'] else None
+            updated = ranking.update_scores(since)
+        self.stdout.write(self.style.SUCCESS(f'Rescored {updated} timeline entries'))
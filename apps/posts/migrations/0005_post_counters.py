@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    schema_editor.execute(
+        'UPDATE posts_post SET '
+        'likes_count = (SELECT COUNT(*) FROM posts_like WHERE posts_like.post_id = posts_post.id), '
+        'comments_count = (SELECT COUNT(*) FROM posts_comment WHERE posts_comment.post_id = posts_post.id)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
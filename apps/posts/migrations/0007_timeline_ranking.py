@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_base_scores(apps, schema_editor):
+    # Базовый скор без вовлечённости; точные значения даст update_feed_scores --all
+    schema_editor.execute(
+        'UPDATE posts_timelineentry SET score = EXTRACT(EPOCH FROM created_at) / %s',
+        [settings.FEED_RANKING['HALF_LIFE_HOURS'] * 3600],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_comment_user_post_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timelineentry',
+            name='affinity',
+            field=models.FloatField(default=1),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-score', '-id'], name='posts_timel_user_id_3f91d8_idx'),
+        ),
+        migrations.RunPython(fill_base_scores, migrations.RunPython.noop),
+    ]
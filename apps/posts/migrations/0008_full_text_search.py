@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:34
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# Конфигурация должна совпадать с apps.posts.search.SEARCH_CONFIG
+TRIGGER_SQL = '''
+CREATE TRIGGER {table}_search_vector_update
+BEFORE INSERT OR UPDATE OF text ON {table}
+FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(search_vector, 'pg_catalog.simple', text);
+UPDATE {table} SET search_vector = to_tsvector('pg_catalog.simple', COALESCE(text, ''));
+'''
+
+DROP_TRIGGER_SQL = 'DROP TRIGGER IF EXISTS {table}_search_vector_update ON {table};'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_timeline_ranking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='posts_comme_search__630017_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='posts_post_search__e0bb56_gin'),
+        ),
+        migrations.RunSQL(
+            TRIGGER_SQL.format(table='posts_post'),
+            DROP_TRIGGER_SQL.format(table='posts_post'),
+        ),
+        migrations.RunSQL(
+            TRIGGER_SQL.format(table='posts_comment'),
+            DROP_TRIGGER_SQL.format(table='posts_comment'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scored_until', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Отметка пересчёта ленты',
+                'verbose_name_plural': 'Отметки пересчёта ленты',
+            },
+        ),
+    ]
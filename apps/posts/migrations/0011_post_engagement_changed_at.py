@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_ranking_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='engagement_changed_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True),
+        ),
+    ]
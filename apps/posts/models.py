@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
@@ -19,6 +21,11 @@ class Post(models.Model):
         null=True,
         blank=True,
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,  # заполняет apps.images.pipeline
+    )
     is_public = models.BooleanField(
         default=True,
     )
@@ -29,11 +36,32 @@ class Post(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True,
     )
+    likes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+    engagement_changed_at = models.DateTimeField(
+        null=True,
+        editable=False,
+        db_index=True,  # ranking.update_scores: посты с изменившимися счётчиками
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,  # заполняет триггер в БД, см. миграцию 0008
+    )
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['author', '-created_at', '-id']),
+            GinIndex(fields=['search_vector']),
+        ]
 
     def __str__(self):
         return f'Пост {self.id} от {self.author.username}' 
@@ -42,13 +70,6 @@ class Post(models.Model):
     def short_text(self):
         return self.text[:100] + ('...' if len(self.text) > 100 else '')
     
-    @property
-    def likes_count(self):
-        return self.likes.count()
-    
-    def comments_count(self):
-        return self.comments.count()
-    
 class Like(models.Model):
     user = models.ForeignKey(
         User, 
@@ -84,12 +105,68 @@ class Comment(models.Model):
     text = models.TextField(max_length=500)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id']),
+            models.Index(fields=['user', 'post']),  # commented_by_me для страницы ленты
+            GinIndex(fields=['search_vector']),
+        ]
 
     def __str__(self):
         return f'Comment {self.user.username} to post {self.post.id}'
     
+
+class TimelineEntry(models.Model):
+    """Materializovannaya lenta: post v lente polzovatelya"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    created_at = models.DateTimeField()  # копия Post.created_at, чтобы лента читалась одним индексом
+    score = models.FloatField(default=0)  # см. apps/posts/ranking.py
+    affinity = models.FloatField(default=1)
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(fields=['user', '-score', '-id']),  # ранжированная лента
+            models.Index(fields=['user', 'author']),  # для очистки ленты при отписке
+        ]
+
+    def __str__(self):
+        return f'Timeline({self.user_id}: post {self.post_id})'
+
+
+class RankingWatermark(models.Model):
+    """Do kakogo momenta pereschitany skory lenty (odna stroka, sm. ranking.update_scores)"""
+
+    scored_until = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Отметка пересчёта ленты'
+        verbose_name_plural = 'Отметки пересчёта ленты'
+
+    def __str__(self):
+        return f'RankingWatermark({self.scored_until})'
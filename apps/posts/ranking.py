@@ -0,0 +1,140 @@
+"""Ranzhirovannaya lenta: predraschitannyi skor v TimelineEntry.score.
+
+    score = log2(1 + engagement) + log2(affinity) + created_at / half_life
+
+engagement = laiki + 2 * kommentarii, affinity - blizost' chitatelya k
+avtoru (druzhba, ego laiki i kommentarii postov avtora). Zatuhanie vo
+vremeni zalozheno v poslednee slagaemoe: udvoenie vovlechennosti
+kompensiruet odin period poluraspada vozrasta, a poryadok zapisei ne
+menyaetsya so vremenem, poetomu skor nado pereschityvat' tol'ko kogda
+menyaetsya vovlechennost' ili affinity, a ne po tiku chasov.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from apps.friends import graph
+from apps.friends.models import Friendship
+from .models import Post, Like, Comment, RankingWatermark, TimelineEntry
+
+WATERMARK_ID = 1
+
+
+def _half_life_seconds():
+    return settings.FEED_RANKING['HALF_LIFE_HOURS'] * 3600
+
+
+def base_score(created_at):
+    """Skor svezhego posta bez vovlechennosti"""
+    return created_at.timestamp() / _half_life_seconds()
+
+
+def score(created_at, engagement, affinity):
+    return math.log2(1 + engagement) + math.log2(affinity) + base_score(created_at)
+
+
+def engagement(likes_count, comments_count):
+    return likes_count + settings.FEED_RANKING['COMMENT_WEIGHT'] * comments_count
+
+
+def affinities(pairs):
+    """{(user_id, author_id): affinity} dlya nabora par, fiksirovannoe chislo zaprosov"""
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    user_ids = {user_id for user_id, _ in pairs}
+    author_ids = {author_id for _, author_id in pairs}
+
+    interactions = dict.fromkeys(pairs, 0)
+    for model in (Like, Comment):
+        rows = model.objects.filter(
+            user_id__in=user_ids,
+            post__author_id__in=author_ids,
+        ).values('user_id', 'post__author_id').annotate(total=Count('id')).order_by()
+        for row in rows:
+            pair = (row['user_id'], row['post__author_id'])
+            if pair in interactions:
+                interactions[pair] += row['total']
+
+    friends = graph.friends_of_many(user_ids)
+
+    bonus = settings.FEED_RANKING['FRIEND_BONUS']
+    result = {}
+    for user_id, author_id in pairs:
+        affinity = 1 + math.log2(1 + interactions[(user_id, author_id)])
+        if graph.contains(friends[user_id], author_id):
+            affinity += bonus
+        result[(user_id, author_id)] = affinity
+    return result
+
+
+def rescore(entry_filter, batch_size=2000):
+    """Pereschitat' skor zapisei lenty, podhodyashchih pod filtr"""
+    entries = TimelineEntry.objects.filter(entry_filter).order_by('id')
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(
+            entries.filter(id__gt=last_id).select_related('post').only(
+                'id', 'user_id', 'author_id', 'created_at',
+                'post__likes_count', 'post__comments_count',
+            )[:batch_size]
+        )
+        if not batch:
+            return updated
+        last_id = batch[-1].id
+        weights = affinities((entry.user_id, entry.author_id) for entry in batch)
+        for entry in batch:
+            entry.affinity = weights[(entry.user_id, entry.author_id)]
+            entry.score = score(
+                entry.created_at,
+                engagement(entry.post.likes_count, entry.post.comments_count),
+                entry.affinity,
+            )
+        TimelineEntry.objects.bulk_update(batch, ['affinity', 'score'])
+        updated += len(batch)
+
+
+def update_scores(since=None):
+    """Inkremental'nyi pereschet: tol'ko to, chto izmenilos' s proshlogo zapuska"""
+    now = timezone.now()
+    if since is None:
+        # Отметка в БД: переживает рестарт и общая для всех процессов
+        since = (
+            RankingWatermark.objects.filter(pk=WATERMARK_ID).values_list('scored_until', flat=True).first()
+            or now - timedelta(hours=settings.FEED_RANKING['LOOKBACK_HOURS'])
+        )
+
+    # Новые посты (их записи ещё без affinity) и посты с изменившимися
+    # счётчиками — в обе стороны, включая снятые лайки и удалённые комментарии
+    post_ids = set(Post.objects.filter(
+        Q(created_at__gte=since) | Q(engagement_changed_at__gte=since)
+    ).values_list('id', flat=True))
+    pairs = set()
+    for model in (Like, Comment):
+        for post_id, user_id, author_id in model.objects.filter(created_at__gte=since).values_list(
+            'post_id', 'user_id', 'post__author_id'
+        ):
+            post_ids.add(post_id)
+            pairs.add((user_id, author_id))
+    # Новая дружба меняет affinity в обе стороны
+    for user1_id, user2_id in Friendship.objects.filter(created_at__gte=since).values_list('user1_id', 'user2_id'):
+        pairs.add((user1_id, user2_id))
+        pairs.add((user2_id, user1_id))
+
+    updated = 0
+    post_ids = sorted(post_ids)
+    for i in range(0, len(post_ids), 500):
+        updated += rescore(Q(post_id__in=post_ids[i:i + 500]))
+    pairs = sorted(pairs)
+    for i in range(0, len(pairs), 200):
+        condition = Q()
+        for user_id, author_id in pairs[i:i + 200]:
+            condition |= Q(user_id=user_id, author_id=author_id)
+        updated += rescore(condition)
+
+    RankingWatermark.objects.update_or_create(pk=WATERMARK_ID, defaults={'scored_until': now})
+    return updated
@@ -0,0 +1,48 @@
+"""Polnotekstovyi poisk po postam i kommentariyam.
+
+search_vector zapolnyaetsya triggerom v BD (migratsiya 0008) i
+indeksiruetsya GIN, poetomu poisk ne delaet ILIKE-skanov tablits.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Post, Comment
+
+# Должна совпадать с конфигурацией триггера в миграции 0008
+SEARCH_CONFIG = 'simple'
+
+# Совпадение в комментарии весит меньше совпадения в самом посте
+COMMENT_RANK_WEIGHT = 0.5
+
+
+def make_query(text):
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+
+
+def search_posts(user, text):
+    """Posty, vidimye polzovatelyu, s rank po tekstu posta i ego kommentariev"""
+    query = make_query(text)
+    # Каждая ветка UNION идёт по своему GIN-индексу; OR с EXISTS свёл бы всё к seq scan
+    matching_ids = Post.objects.filter(search_vector=query).order_by().values('pk').union(
+        Comment.objects.filter(search_vector=query).order_by().values('post_id')
+    )
+    matching_comments = Comment.objects.filter(post=OuterRef('pk'), search_vector=query)
+    best_comment_rank = Subquery(
+        matching_comments.annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank').values('rank')[:1],
+        output_field=FloatField(),
+    )
+    return Post.objects.filter(
+        Q(is_public=True) | Q(author=user)
+    ).filter(
+        pk__in=matching_ids
+    ).annotate(
+        # ts_rank возвращает real; приводим к double, чтобы курсор пагинации сравнивался точно
+        rank=Cast(
+            Coalesce(SearchRank(F('search_vector'), query), Value(0.0))
+            + COMMENT_RANK_WEIGHT * Coalesce(best_comment_rank, Value(0.0)),
+            output_field=FloatField(),
+        ),
+    ).select_related('author')
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Post, Comment, Like
+from apps.images import pipeline
+from . import like_buffer
 
 User = get_user_model()
 
@@ -37,17 +39,82 @@ class LikeSerializer(serializers.ModelSerializer):
         validated_data['user'] = request.user
         return super().create(validated_data)
 
+def viewer_state(user, post_ids):
+    """Chto smotryashchii uzhe sdelal s postami: dva zaprosa na vsyu stranicu"""
+    if user is None or not user.is_authenticated or not post_ids:
+        return {'liked': set(), 'commented': set()}
+    liked = set(
+        Like.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True)
+    )
+    for post_id, state in like_buffer.pending_states(user.pk, post_ids).items():
+        if state:
+            liked.add(post_id)
+        else:
+            liked.discard(post_id)
+    commented = set(
+        Comment.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True).distinct()
+    )
+    return {'liked': liked, 'commented': commented}
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """Dostaet buferizovannye laiki i sostoyanie smotryashchego odnim paketom na vsyu stranicu"""
+
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, 'all') else data)
+        post_ids = [post.pk for post in posts]
+        request = self.context.get('request')
+        self.context['like_deltas'] = like_buffer.pending_deltas(post_ids)
+        self.context['viewer_state'] = viewer_state(getattr(request, 'user', None), post_ids)
+        return super().to_representation(posts)
+
+
 class PostSerializer(serializers.ModelSerializer):
 
     author = AuthorSerializer(read_only=True)
-    likes_count = serializers.IntegerField(source='likes.count', read_only=True)
-    comment_count = serializers.IntegerField(source='comments.count', read_only=True)
+    comment_count = serializers.IntegerField(source='comments_count', read_only=True)
     image = serializers.ImageField(required=False, allow_null=True)
+    image_variants = serializers.SerializerMethodField()
+    liked_by_me = serializers.SerializerMethodField()
+    commented_by_me = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
-        fields = ['id', 'author', 'image', 'text', 'is_public', 'created_at', 'updated_at', 'likes_count', 'comment_count']
-        read_only_fields = ['id', 'author', 'created_at', 'updated_at']
+        fields = [
+            'id', 'author', 'image', 'image_variants', 'text', 'is_public', 'created_at', 'updated_at',
+            'likes_count', 'comment_count', 'liked_by_me', 'commented_by_me',
+        ]
+        read_only_fields = ['id', 'author', 'created_at', 'updated_at', 'likes_count']
+        list_serializer_class = PostListSerializer
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        deltas = self.context.get('like_deltas')
+        if deltas is None:
+            deltas = like_buffer.pending_deltas([instance.pk])
+        data['likes_count'] = max(instance.likes_count + deltas.get(instance.pk, 0), 0)
+        return data
+
+    def get_image_variants(self, obj):
+        return pipeline.variant_urls(obj.image_variants, self.context.get('request'))
+
+    def _viewer_state(self, obj):
+        state = self.context.get('viewer_state')
+        if state is not None:
+            return state
+        # Одиночный пост (detail/create/update): считаем один раз на оба поля
+        cached = getattr(self, '_own_viewer_state', None)
+        if cached is None or cached[0] != obj.pk:
+            request = self.context.get('request')
+            cached = (obj.pk, viewer_state(getattr(request, 'user', None), [obj.pk]))
+            self._own_viewer_state = cached
+        return cached[1]
+
+    def get_liked_by_me(self, obj):
+        return obj.pk in self._viewer_state(obj)['liked']
+
+    def get_commented_by_me(self, obj):
+        return obj.pk in self._viewer_state(obj)['commented']
 
     def create(self, validated_data):
         request = self.context.get('request')
@@ -58,7 +125,8 @@ class PostSerializer(serializers.ModelSerializer):
         
         for field, value in validated_data.items():
             setattr(instance, field, value)
-        instance.save()
+        # Счётчики меняются через F() параллельно — не перетирать их значениями из памяти
+        instance.save(update_fields=[*validated_data, 'updated_at'])
         return instance
     
 
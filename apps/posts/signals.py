@@ -0,0 +1,106 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.friends.models import Friendship, Follow
+from apps.images import pipeline
+from .models import Post, Like, Comment, TimelineEntry
+from . import counters, feed_cache, timeline
+
+pipeline.watch(Post, 'image', 'image_variants')
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    """Razlozhit' novyi post po lentam, sinhronizirovat' lentu pri smene is_public"""
+    if created:
+        timeline.fan_out(instance)
+    elif not instance.is_public:
+        timeline.remove_post(instance)
+    elif not TimelineEntry.objects.filter(post=instance).exists():
+        timeline.fan_out(instance)
+
+
+def _bump_feeds(user_ids):
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: feed_cache.bump(user_ids))
+
+
+@receiver(post_save, sender=Post)
+def invalidate_feeds_on_post_save(sender, instance, **kwargs):
+    if feed_cache.enabled():
+        _bump_feeds(timeline.audience_of(instance.author_id))
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_feeds_on_post_delete(sender, instance, **kwargs):
+    if feed_cache.enabled():
+        _bump_feeds(timeline.audience_of(instance.author_id))
+
+
+@receiver(post_save, sender=Friendship)
+def backfill_friend_timelines(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user1_id, instance.user2_id)
+        timeline.backfill(instance.user2_id, instance.user1_id)
+
+
+@receiver(post_delete, sender=Friendship)
+def purge_friend_timelines(sender, instance, **kwargs):
+    timeline.purge(instance.user1_id, instance.user2_id)
+    timeline.purge(instance.user2_id, instance.user1_id)
+
+
+@receiver(post_save, sender=Friendship)
+@receiver(post_delete, sender=Friendship)
+def invalidate_friend_feeds(sender, instance, **kwargs):
+    _bump_feeds([instance.user1_id, instance.user2_id])
+
+
+@receiver(post_save, sender=Follow)
+def backfill_follower_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.follower_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def purge_follower_timeline(sender, instance, **kwargs):
+    timeline.purge(instance.follower_id, instance.following_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follower_feed(sender, instance, **kwargs):
+    _bump_feeds([instance.follower_id])
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_own_feed(sender, instance, **kwargs):
+    """Svoi laik/kommentarii dolzhen byt' viden v lente srazu (liked_by_me).
+    Schetchiki posta v chuzhih lentah ne keshiruyutsya (feed_cache.refresh_counters),
+    poetomu auditoriyu avtora sbrasyvat' ne nuzhno"""
+    _bump_feeds([instance.user_id])
+
+
+@receiver(post_save, sender=Like)
+def increment_likes_count(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(instance.post_id, 'likes_count')
+
+
+@receiver(post_delete, sender=Like)
+def decrement_likes_count(sender, instance, **kwargs):
+    counters.increment(instance.post_id, 'likes_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comments_count(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(instance.post_id, 'comments_count')
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comments_count(sender, instance, **kwargs):
+    counters.increment(instance.post_id, 'comments_count', -1)
@@ -0,0 +1,115 @@
+"""Materializovannaya lenta (fan-out on write).
+
+Kazhdyi publichnyi post raskladyvaetsya v TimelineEntry vsem, kto ego vidit:
+avtoru, ego druz'yam i podpischikam. Chtenie lenty - odin range scan po
+indeksu (user, -created_at, -id).
+"""
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from apps.friends import graph
+from .models import Post, TimelineEntry
+from .ranking import base_score
+
+
+def audience_of(author_id):
+    """Vse polzovateli, v ch'ei lente poyavlyayutsya posty avtora"""
+    audience = set(graph.friends_of(author_id))
+    audience.update(graph.followers_of(author_id))
+    audience.add(author_id)
+    return audience
+
+
+def can_see(user_id, author_id):
+    """Vidit li polzovatel' publichnye posty avtora v svoei lente"""
+    return (
+        user_id == author_id
+        or graph.are_friends(user_id, author_id)
+        or graph.follows(user_id, author_id)
+    )
+
+
+def _entry(user_id, post):
+    return TimelineEntry(
+        user_id=user_id,
+        post=post,
+        author_id=post.author_id,
+        created_at=post.created_at,
+        score=base_score(post.created_at),
+    )
+
+
+def fan_out(post):
+    """Dobavit' post v lenty vsei auditorii avtora"""
+    if not post.is_public:
+        return
+    audience = audience_of(post.author_id)
+    TimelineEntry.objects.bulk_create(
+        [_entry(uid, post) for uid in audience],
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+    # Обрезка амортизирована: каждый пост обрезает ~1/N аудитории,
+    # так что лента не уходит дальше глубины больше чем на N записей.
+    every = settings.FEED_TIMELINE_TRIM_EVERY
+    trim([uid for uid in audience if (uid + post.pk) % every == 0])
+
+
+def remove_post(post):
+    """Ubrat' post iz vseh lent (post stal nepublichnym)"""
+    TimelineEntry.objects.filter(post=post).delete()
+
+
+def backfill(user_id, author_id):
+    """Podtyanut' poslednie posty avtora v lentu polzovatelya"""
+    posts = Post.objects.filter(
+        author_id=author_id,
+        is_public=True,
+    ).order_by('-created_at')[:settings.FEED_TIMELINE_DEPTH]
+    TimelineEntry.objects.bulk_create(
+        [_entry(user_id, post) for post in posts],
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def purge(user_id, author_id):
+    """Ubrat' posty avtora iz lenty, esli polzovatel' bol'she ego ne vidit"""
+    if can_see(user_id, author_id):
+        return
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def trim(user_ids):
+    """Ostavit' v kazhdoi lente ne bol'she FEED_TIMELINE_DEPTH zapisei"""
+    if not user_ids:
+        return
+    overflow = TimelineEntry.objects.filter(user_id__in=user_ids).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        )
+    ).filter(position__gt=settings.FEED_TIMELINE_DEPTH).values_list('id', flat=True)
+    stale_ids = list(overflow)
+    if stale_ids:
+        TimelineEntry.objects.filter(id__in=stale_ids).delete()
+
+
+def rebuild(user_id):
+    """Polnost'yu perestroit' lentu polzovatelya iz Friendship/Follow"""
+    authors = set(graph.friends_of(user_id))
+    authors.update(graph.followings_of(user_id))
+    authors.add(user_id)
+
+    posts = Post.objects.filter(
+        author_id__in=authors,
+        is_public=True,
+    ).order_by('-created_at', '-id')[:settings.FEED_TIMELINE_DEPTH]
+
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    TimelineEntry.objects.bulk_create(
+        [_entry(user_id, post) for post in posts],
+        batch_size=1000,
+    )
@@ -2,10 +2,13 @@ from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import Post, Like, Comment
+from .models import Post, Like, Comment, TimelineEntry
 from .serializers import PostSerializer, LikeSerializer, CommentSerializer
-from apps.friends.models import Friendship, Follow
-from django.db.models import Q, F, When, Case, Value
+from apps.api.pagination import (
+    KeysetPagination, AscendingKeysetPagination, RankedKeysetPagination, SearchKeysetPagination,
+)
+from . import feed_cache, like_buffer
+from .search import search_posts
 
 
 class IsAuthorOrReadOnly(permissions.BasePermission):
@@ -22,6 +25,15 @@ class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.select_related('author').all()
     permission_classes = [permissions.IsAuthenticated, IsAuthorOrReadOnly]
 
+    @property
+    def paginator(self):
+        # ?order=ranked листает ленту по (score, id), а не по (created_at, id)
+        if self.action == 'feed' and self.request.query_params.get('order') == 'ranked':
+            if not hasattr(self, '_ranked_paginator'):
+                self._ranked_paginator = RankedKeysetPagination()
+            return self._ranked_paginator
+        return super().paginator
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
     
@@ -33,15 +45,43 @@ class PostViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(author__username=author_username)
         return queryset
     
-    @action(detail=False, methods=['get'], url_path='my')
+    @action(detail=False, methods=['get'], url_path='my', pagination_class=KeysetPagination)
     def my_posts(self, request):
-        posts = Post.objects.filter(author=request.user)
+        posts = Post.objects.filter(author=request.user).select_related('author')
+
+        page = self.paginate_queryset(posts)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
         serializer = self.get_serializer(posts, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
+    @action(detail=False, methods=['get'], url_path='search', pagination_class=SearchKeysetPagination)
+    def search(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({"detail": "Parametr q obyazatelen."}, status=status.HTTP_400_BAD_REQUEST)
+
+        posts = search_posts(request.user, text)
+        page = self.paginate_queryset(posts)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(posts, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=["post"], url_path="like")
     def like(self, request, pk=None):
         post = get_object_or_404(Post, pk=pk)
+        if like_buffer.enabled():
+            liked, likes_count = like_buffer.toggle(post, request.user)
+            feed_cache.bump([request.user.pk])
+            return Response(
+                {"detail": "Пост лайкнут." if liked else "Лайк удалён.", "liked": liked, "likes_count": likes_count},
+                status=status.HTTP_201_CREATED if liked else status.HTTP_200_OK,
+            )
         like, created = Like.objects.get_or_create(user=request.user, post=post)
         if not created:
             like.delete()
@@ -49,12 +89,16 @@ class PostViewSet(viewsets.ModelViewSet):
         return Response({"detail": "Пост лайкнут."}, status=status.HTTP_201_CREATED)
 
     # ---------- КОММЕНТАРИИ ----------
-    @action(detail=True, methods=["get", "post"], url_path="comments")
+    @action(detail=True, methods=["get", "post"], url_path="comments", pagination_class=AscendingKeysetPagination)
     def comments(self, request, pk=None):
         post = get_object_or_404(Post, pk=pk)
 
         if request.method == "GET":
             comments = post.comments.select_related("user")
+            page = self.paginate_queryset(comments)
+            if page is not None:
+                serializer = CommentSerializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
             serializer = CommentSerializer(comments, many=True)
             return Response(serializer.data)
 
@@ -64,47 +108,30 @@ class PostViewSet(viewsets.ModelViewSet):
             serializer.save(post=post)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         
-    @action(detail=False, methods=['get'], url_path='feed')
+    @action(detail=False, methods=['get'], url_path='feed', pagination_class=KeysetPagination)
     def feed(self, request):
-        user = request.user
-
-        friend_ids = Friendship.objects.filter(
-            Q(user1=user) | Q(user2=user)
-        ).values_list('user1_id', 'user2_id')
-
-        friends_set = {uid for pair in friend_ids
-                       for uid in pair if uid != user.id}
-        
-        following_ids = set(
-            Follow.objects.filter(follower=user).values_list('following_id', flat=True)
-        )
-
-        visible_authors = friends_set | following_ids | {user.id}
-
-        posts = Post.objects.filter(
-            author_id__in=visible_authors,
-            is_public=True
-        ).select_related('author').order_by('-created_at')
-
-        page = self.paginate_queryset(posts)
+        cache_key = feed_cache.page_key(request) if feed_cache.enabled() else None
+        if cache_key is not None:
+            data = feed_cache.lookup(cache_key)
+            if data is not None:
+                return Response(feed_cache.refresh_counters(data), headers={'X-Feed-Cache': 'hit'})
+
+        entries = TimelineEntry.objects.filter(
+            user=request.user
+        ).select_related('post__author')
+        if request.query_params.get('order') == 'ranked':
+            entries = entries.order_by('-score', '-id')
+        else:
+            entries = entries.order_by('-created_at', '-id')
+
+        page = self.paginate_queryset(entries)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(posts, many=True)
+            serializer = self.get_serializer([entry.post for entry in page], many=True)
+            response = self.get_paginated_response(serializer.data)
+            if cache_key is not None:
+                feed_cache.store(cache_key, response.data)
+                response['X-Feed-Cache'] = 'miss'
+            return response
+
+        serializer = self.get_serializer([entry.post for entry in entries], many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
-
-        # flat_firends_ids = set()
-        # for pair in friend_ids:
-        #     flat_firends_ids.update(pair)
-        # flat_firends_ids.discard(user.id)
-
-        # following_ids = Follow.objects.filter(follower=user).values_list('following_id', flat=True)
-        # visible_authors = set(flat_firends_ids) | set(following_ids) | {user.id}
-
-        # posts = (
-        #     Post.objects.filter(author_id__in=visible_authors).select_related('author').order_by('-created_at')
-        # )
-
-        # serializer = self.get_serializer(posts, many=True)
-        # return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
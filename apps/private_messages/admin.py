@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Chat, Message
+from .models import Chat, Message, ChatReadState
 
 
 @admin.register(Chat)
@@ -16,17 +16,24 @@ class ChatAdmin(admin.ModelAdmin):
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ['chat', 'sender', 'short_text', 'is_read', 'is_edited', 'created_at']
-    list_filter = ['is_read', 'is_edited', 'created_at']
+    list_display = ['chat', 'sender', 'short_text', 'is_edited', 'created_at']
+    list_filter = ['is_edited', 'created_at']
     search_fields = ['sender__username', 'text']
     readonly_fields = ['created_at', 'updated_at']
     
     fieldsets = (
         ('Информация', {'fields': ('chat', 'sender', 'text')}),
-        ('Статус', {'fields': ('is_read', 'is_edited')}),
+        ('Статус', {'fields': ('is_edited',)}),
         ('Дата', {'fields': ('created_at', 'updated_at'), 'classes': ('collapse',)}),
     )
 
     def short_text(self, obj):
         return obj.text[:50] + ('...' if len(obj.text) > 50 else '')
-    short_text.short_description = 'Текст'
\ No newline at end of file
+    short_text.short_description = 'Текст'
+
+
+@admin.register(ChatReadState)
+class ChatReadStateAdmin(admin.ModelAdmin):
+    list_display = ['chat', 'user', 'last_read_message_id', 'unread_count']
+    search_fields = ['user__username']
+    raw_id_fields = ['chat', 'user']
@@ -0,0 +1,95 @@
+"""Zhurnal izmenenii chatov (ChatEvent) dlya delta-sinhronizatsii.
+
+Signaly soobshchenii i otmetki prochteniya dopisyvayut sobytiya v
+ChatEvent. Klient posle perepodklyucheniya prisylaet id poslednego
+uvidennogo sobytiya (ili soobshcheniya) i poluchaet vse posleduyushchie
+sobytiya po vsem svoim chatam odnim zaprosom po indeksu (chat, id):
+stoimost' zavisit ot chisla izmenenii, a ne ot istorii.
+
+Id sobytii vydayutsya do kommita, a tranzaktsii kommityatsya ne po
+poryadku: sobytie s men'shim id mozhet stat' vidimym uzhe posle togo, kak
+kursor klienta ushel dal'she. Poetomu otdaetsya tol'ko prefiks zhurnala
+do pervogo sobytiya molozhe VISIBILITY_LAG sekund - k etomu momentu vse
+tranzaktsii koroche lag uzhe zakommicheny.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Chat, ChatEvent
+
+
+class CursorExpired(Exception):
+    """Sobytiya posle kursora uzhe udaleny: nuzhna polnaya sinhronizatsiya"""
+
+
+def message_payload(message):
+    return {
+        'text': message.text,
+        'sender': {'id': message.sender_id, 'username': message.sender.username},
+        'created_at': message.created_at.isoformat(),
+        'is_edited': message.is_edited,
+    }
+
+
+def record(chat_id, kind, actor_id=None, message_id=None, payload=None):
+    return ChatEvent.objects.create(
+        chat_id=chat_id,
+        kind=kind,
+        actor_id=actor_id,
+        message_id=message_id,
+        payload=payload or {},
+    )
+
+
+def _visibility_cutoff():
+    return timezone.now() - timedelta(seconds=settings.CHAT_SYNC['VISIBILITY_LAG'])
+
+
+def latest_id():
+    """Nachal'nyi kursor: pered samym rannim eshche 'svezhim' sobytiem"""
+    barrier = ChatEvent.objects.filter(created_at__gt=_visibility_cutoff()).aggregate(Min('id'))['id__min']
+    if barrier is not None:
+        return barrier - 1
+    return ChatEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def event_for_message(message_id):
+    """Kursor po id soobshcheniya: sobytie ego sozdaniya, no ne dal'she latest_id().
+
+    Svezhee soobshchenie ne dolzhno perenosit' kursor cherez eshche ne
+    zakommichennye sobytiya s men'shim id; povtornye sobytiya klient
+    otbrasyvaet po id.
+    """
+    event_id = ChatEvent.objects.filter(
+        message_id=message_id,
+        kind=ChatEvent.KIND_MESSAGE_CREATED,
+    ).values_list('id', flat=True).first()
+    if event_id is None:
+        return None
+    return min(event_id, latest_id())
+
+
+def since(user, event_id, limit=None):
+    """Sobytiya vseh chatov polzovatelya posle event_id; (sobytiya, est' li eshche)"""
+    limit = limit or settings.CHAT_SYNC['LIMIT']
+    oldest = ChatEvent.objects.order_by('id').values_list('id', flat=True).first()
+    if oldest is not None and event_id < oldest - 1:
+        raise CursorExpired
+    chat_ids = list(Chat.objects.filter(participants=user).values_list('id', flat=True))
+    pending = ChatEvent.objects.filter(chat_id__in=chat_ids, id__gt=event_id)
+    # Свежие события ещё могут «догнать» меньшие id — отдаём только то, что до них
+    barrier = pending.filter(created_at__gt=_visibility_cutoff()).aggregate(Min('id'))['id__min']
+    if barrier is not None:
+        pending = pending.filter(id__lt=barrier)
+    events = list(pending.order_by('id')[:limit + 1])
+    return events[:limit], len(events) > limit
+
+
+def prune(days=None):
+    """Udalit' sobytiya starshe RETENTION_DAYS"""
+    days = days or settings.CHAT_SYNC['RETENTION_DAYS']
+    deleted, _ = ChatEvent.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
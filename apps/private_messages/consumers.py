@@ -1,84 +1,166 @@
+import asyncio
 import json
+import time
+from collections import Counter
+
+import msgpack
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from .models import Chat, Message
+from .events import send_to_users, user_group
+from . import message_buffer, presence
 from apps.notifications.utils import create_notification
 
 User = get_user_model()
 
 class ChatConsumer(AsyncWebsocketConsumer):
-    """WebSocket Consumer для real-time чатов"""
+    """Один WebSocket на пользователя для всех его чатов.
+
+    Соединение состоит только в группе user_<id>. Новые сообщения приходят
+    по всем чатам пользователя, события прочтения — по чатам, на которые
+    клиент подписан фреймом subscribe.
+
+    Клиент может запросить подпротокол msgpack — тогда фреймы бинарные.
+    new_message и messages_read копятся COALESCE_WINDOW секунд и уходят
+    одним фреймом {'event': 'batch', 'data': [...]}.
+
+    Присутствие и набор текста живут только в presence (TTL, без БД).
+    Подписка на чат добавляет сокет в группы presence_<id> участников,
+    набор рассылается в их user-группы не чаще TYPING_INTERVAL.
+    """
+
+    # события, которые можно склеивать в один фрейм
+    COALESCED_EVENTS = ('new_message', 'messages_read', 'typing')
 
     async def connect(self):
-        self.chat_id = int(self.scope['url_route']['kwargs']['chat_id'])
-        self.group_name = f'chat_{self.chat_id}'
         self.user = self.scope['user']
 
         if not self.user.is_authenticated:
             await self.close(code=4001)
             return
-        
-        # Проверить что пользователь участник чата
-        is_participant = await self.check_participant()
-        if not is_participant:
-            await self.close(code=4003)
-            return
-        
-        # Добавить в группу
+
+        self.group_name = user_group(self.user.id)
+        # chat_id -> (chat, participant_ids, recipient), заполняется лениво
+        self.memberships = {}
+        self.subscriptions = set()
+        self.pending = []
+        self.flush_task = None
+        # user_id -> число подписанных чатов, где он участник
+        self.watching = Counter()
+        self.presence_refreshed_at = 0
+
+        options = settings.CHAT_SOCKET
+        self.binary = options['SUBPROTOCOL_MSGPACK'] in self.scope.get('subprotocols', [])
+
         await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
+        await self.accept(subprotocol=options['SUBPROTOCOL_MSGPACK'] if self.binary else None)
+        await self.refresh_presence()
     
     async def disconnect(self, close_code):
         """Отключиться от группы"""
+        if getattr(self, 'flush_task', None) is not None:
+            self.flush_task.cancel()
+        if not hasattr(self, 'group_name'):
+            return
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        for user_id in self.watching:
+            await self.channel_layer.group_discard(presence.presence_group(user_id), self.channel_name)
+        if await sync_to_async(presence.disconnect)(self.user.id, self.channel_name):
+            await self.broadcast_presence(online=False)
     
     async def receive(self, text_data=None, bytes_data=None):
         """Получить сообщение от клиента"""
-        if text_data is None:
-            return
-        
         try:
-            data = json.loads(text_data)  # ✅ json.loads() вместо json.load()
-        except json.JSONDecodeError:
+            if bytes_data is not None and self.binary:
+                data = msgpack.unpackb(bytes_data, raw=False)
+            elif text_data is not None:
+                data = json.loads(text_data)  # ✅ json.loads() вместо json.load()
+            else:
+                return
+        except (json.JSONDecodeError, ValueError, msgpack.UnpackException):
+            await self.send_json({'error': 'invalid_json'})
+            return
+        if not isinstance(data, dict):
             await self.send_json({'error': 'invalid_json'})
             return
         
+        # Любой фрейм продлевает присутствие; heartbeat — только для этого
+        await self.refresh_presence()
         action = data.get('action')
+        if action == 'heartbeat':
+            return
+        try:
+            chat_id = int(data.get('chat_id'))
+        except (TypeError, ValueError):
+            await self.send_json({'error': 'invalid_chat_id'})
+            return
+
+        membership = await self.get_membership(chat_id)
+        if membership is None:
+            await self.send_json({'error': 'not_a_participant', 'chat_id': chat_id})
+            return
+
+        if action == 'subscribe':
+            if chat_id not in self.subscriptions:
+                self.subscriptions.add(chat_id)
+                await self.watch(membership[1])
+            online = await sync_to_async(presence.online)(membership[1] - {self.user.id})
+            await self.send_json({'event': 'subscribed', 'data': {'chat_id': chat_id, 'online': sorted(online)}})
+
+        elif action == 'unsubscribe':
+            if chat_id in self.subscriptions:
+                self.subscriptions.discard(chat_id)
+                await self.unwatch(membership[1])
+            await self.send_json({'event': 'unsubscribed', 'data': {'chat_id': chat_id}})
 
-        if action == 'send_message':
+        elif action == 'typing':
+            # Лишние кадры быстрого набора проглатываются без рассылки
+            if not await sync_to_async(presence.allow_typing)(chat_id, self.user.id):
+                return
+            await send_to_users(self.channel_layer, membership[1] - {self.user.id}, {
+                'type': 'chat.typing',
+                'chat_id': chat_id,
+                'user_id': self.user.id,
+                'expires_in': settings.PRESENCE['TYPING_INTERVAL'],
+            })
+
+        elif action == 'send_message':
             text = data.get('text', '').strip()
             if not text:
                 await self.send_json({'error': 'empty_text'})
                 return
             
-            message = await self.create_message(text)
-            
-            # Отправить уведомление получателю
-            recipient = await self.get_other_participant()
-            if recipient:
-                await database_sync_to_async(create_notification)(
-                    recipient=recipient,
-                    sender=self.user,
-                    type='message',
-                    content_object=message,
-                )
+            chat, participant_ids, recipient = membership
+            if message_buffer.enabled():
+                try:
+                    message = await database_sync_to_async(message_buffer.submit)(
+                        chat, self.user, text, recipient.id if recipient else None,
+                    )
+                except message_buffer.BufferFull:
+                    await self.send_json({'error': 'busy', 'chat_id': chat_id})
+                    return
+            else:
+                message = await self.create_message(chat, recipient, text)
             
-            # Отправить всем в группе
-            await self.channel_layer.group_send(
-                self.group_name,
-                {
-                    'type': 'chat.message',  # ✅ chat.message вместо chat_message
-                    'message': {
-                        'id': message.id,
-                        'chat': self.chat_id,
-                        'text': message.text,
-                        'sender': {'id': self.user.id, 'username': self.user.username},
-                        'created_at': message.created_at.isoformat(),
-                        'is_read': message.is_read,
-                    },
-                }
-            )
+            # Разослать в личные группы всех участников
+            await send_to_users(self.channel_layer, participant_ids, {
+                'type': 'chat.message',  # ✅ chat.message вместо chat_message
+                'message': {
+                    'id': message.id,
+                    'chat': chat_id,
+                    'text': message.text,
+                    'sender': {'id': self.user.id, 'username': self.user.username},
+                    'created_at': message.created_at.isoformat(),
+                },
+            })
+            # Подтверждение отправителю: сообщение принято и получило id
+            await self.send_json({
+                'event': 'ack',
+                'data': {'chat_id': chat_id, 'id': message.id, 'client_id': data.get('client_id')},
+            })
 
     async def chat_message(self, event):
         """Отправить сообщение клиенту"""
@@ -89,38 +171,152 @@ class ChatConsumer(AsyncWebsocketConsumer):
     
     async def chat_read(self, event):
         """Отправить событие прочтения"""
+        if event['chat_id'] not in self.subscriptions:
+            return
         await self.send_json({
             'event': 'messages_read',
-            'data': {'chat_id': event['chat_id'], 'reader_id': event['reader_id']}
+            'data': {
+                'chat_id': event['chat_id'],
+                'reader_id': event['reader_id'],
+                'last_read_message_id': event['last_read_message_id'],
+            }
         })
     
-    async def check_participant(self):
-        """✅ Правильно: async метод с database_sync_to_async"""
-        try:
-            chat = await database_sync_to_async(Chat.objects.get)(id=self.chat_id)
-            return await database_sync_to_async(
-                lambda: chat.participants.filter(id=self.user.id).exists()
-            )()
-        except Chat.DoesNotExist:
-            return False
+    async def chat_typing(self, event):
+        """Кто-то набирает текст в подписанном чате"""
+        if event['chat_id'] not in self.subscriptions:
+            return
+        await self.send_json({
+            'event': 'typing',
+            'data': {
+                'chat_id': event['chat_id'],
+                'user_id': event['user_id'],
+                'expires_in': event['expires_in'],
+            }
+        })
+
+    async def presence_changed(self, event):
+        """Участник подписанного чата стал online/offline"""
+        await self.send_json({
+            'event': 'presence',
+            'data': {'user_id': event['user_id'], 'online': event['online']}
+        })
+
+    async def refresh_presence(self):
+        """Продлить TTL соединения не чаще раза в треть TTL"""
+        now = time.monotonic()
+        if now - self.presence_refreshed_at < settings.PRESENCE['TTL'] / 3:
+            return
+        self.presence_refreshed_at = now
+        if await sync_to_async(presence.connect)(self.user.id, self.channel_name):
+            await self.broadcast_presence(online=True)
+
+    async def broadcast_presence(self, online):
+        await self.channel_layer.group_send(presence.presence_group(self.user.id), {
+            'type': 'presence.changed',
+            'user_id': self.user.id,
+            'online': online,
+        })
+
+    async def watch(self, user_ids):
+        for user_id in user_ids - {self.user.id}:
+            if not self.watching[user_id]:
+                await self.channel_layer.group_add(presence.presence_group(user_id), self.channel_name)
+            self.watching[user_id] += 1
+
+    async def unwatch(self, user_ids):
+        for user_id in user_ids - {self.user.id}:
+            if not self.watching[user_id]:
+                continue
+            self.watching[user_id] -= 1
+            if not self.watching[user_id]:
+                del self.watching[user_id]
+                await self.channel_layer.group_discard(presence.presence_group(user_id), self.channel_name)
+
+    async def chat_members(self, event):
+        """Состав чата изменился: забыть кеш, при следующем обращении перечитать"""
+        chat_id = event['chat_id']
+        old = self.memberships.pop(chat_id, None)
+        membership = await self.get_membership(chat_id)
+        if chat_id not in self.subscriptions:
+            return
+        if old is not None:
+            await self.unwatch(old[1])
+        if membership is None:
+            self.subscriptions.discard(chat_id)
+            await self.send_json({'event': 'unsubscribed', 'data': {'chat_id': chat_id}})
+        else:
+            await self.watch(membership[1])
+
+    async def get_membership(self, chat_id):
+        """✅ Чат, участники и получатель — один запрос на чат за всё соединение"""
+        if chat_id in self.memberships:
+            return self.memberships[chat_id]
+
+        def _load():
+            chat = Chat.objects.filter(id=chat_id, participants=self.user).first()
+            if chat is None:
+                return None
+            participants = list(chat.participants.all())
+            participant_ids = {participant.id for participant in participants}
+            others = [participant for participant in participants if participant.id != self.user.id]
+            return chat, participant_ids, (others[0] if others else None)
+
+        membership = await database_sync_to_async(_load)()
+        if membership is not None:
+            self.memberships[chat_id] = membership
+        return membership
     
-    async def create_message(self, text):
-        """✅ Правильно: async обёртка БД операции"""
+    async def create_message(self, chat, recipient, text):
+        """✅ Один INSERT: участие уже проверено по кешу"""
         def _create():
-            chat = Chat.objects.get(id=self.chat_id)
-            return Message.objects.create(chat=chat, sender=self.user, text=text)
+            message = Message(chat=chat, sender=self.user, text=text)
+            message.save(check_participant=False)
+            if recipient is not None:
+                create_notification(
+                    recipient=recipient,
+                    sender=self.user,
+                    type='message',
+                    content_object=message,
+                    deduplicate=False,
+                )
+            return message
         
         return await database_sync_to_async(_create)()
     
-    async def get_other_participant(self):
-        """✅ Правильно: async метод"""
-        def _get():
-            chat = Chat.objects.get(id=self.chat_id)
-            participants = list(chat.participants.exclude(id=self.user.id))
-            return participants[0] if participants else None
-        
-        return await database_sync_to_async(_get)()
-    
     async def send_json(self, obj):
-        """Отправить JSON"""
-        await self.send(text_data=json.dumps(obj))  # ✅ json.dumps() вместо json.dump()
\ No newline at end of file
+        """Отправить фрейм; склеиваемые события ждут окна, остальные уходят сразу"""
+        options = settings.CHAT_SOCKET
+        if obj.get('event') in self.COALESCED_EVENTS and options['COALESCE_WINDOW'] > 0:
+            self.pending.append(obj)
+            if len(self.pending) >= options['COALESCE_MAX_EVENTS']:
+                await self.flush_pending()
+            elif self.flush_task is None:
+                self.flush_task = asyncio.ensure_future(self.flush_later(options['COALESCE_WINDOW']))
+            return
+        # Порядок событий сохраняется: сначала накопленное
+        await self.flush_pending()
+        await self.send_frame(obj)
+
+    async def flush_later(self, delay):
+        await asyncio.sleep(delay)
+        self.flush_task = None
+        await self.flush_pending()
+
+    async def flush_pending(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        if not self.pending:
+            return
+        events, self.pending = self.pending, []
+        if len(events) == 1:
+            await self.send_frame(events[0])
+        else:
+            await self.send_frame({'event': 'batch', 'data': events})
+
+    async def send_frame(self, obj):
+        if self.binary:
+            await self.send(bytes_data=msgpack.packb(obj, use_bin_type=True))
+        else:
+            await self.send(text_data=json.dumps(obj))  # ✅ json.dumps() вместо json.dump()
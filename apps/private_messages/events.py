@@ -0,0 +1,23 @@
+"""Dostavka sobytii chata v personal'nye gruppy polzovatelei.
+
+U kazhdogo polzovatelya odin WebSocket i odna gruppa user_<id>: sobytie
+chata rassylaetsya v gruppy ego uchastnikov, a ne v gruppu chata, poetomu
+chislo soedinenii i chlenstv v gruppah ne rastet s chislom otkrytyh
+perepisok.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+
+def user_group(user_id):
+    return f'user_{user_id}'
+
+
+async def send_to_users(channel_layer, user_ids, event):
+    for user_id in user_ids:
+        await channel_layer.group_send(user_group(user_id), event)
+
+
+def send_to_users_sync(user_ids, event):
+    """Dlya view i signalov"""
+    async_to_sync(send_to_users)(get_channel_layer(), user_ids, event)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.private_messages import message_buffer
+
+
+class Command(BaseCommand):
+    help = 'Zapisat\' buferizovannye soobshcheniya chata v BD'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Rabotat\' postoyanno s intervalom MESSAGE_BUFFER["FLUSH_INTERVAL"]')
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            message_buffer.run_flusher()
+            return
+        flushed = 0
+        while True:
+            written = message_buffer.flush()
+            if not written:
+                break
+            flushed += written
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} messages'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from apps.api import partitions
+
+
+class Command(BaseCommand):
+    help = 'Sozdat\' budushchie sektsii Message/Notification i arhivirovat\' starye'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', action='append', dest='tables',
+                            help='Tablitsa iz PARTITIONING["TABLES"] (mozhno neskol\'ko raz); po umolchaniyu vse')
+        parser.add_argument('--months-ahead', type=int, help='Na skol\'ko mesyatsev vpered sozdat\' sektsii')
+        parser.add_argument('--retain-months', type=int, help='Skol\'ko mesyatsev derzhat\' v BD')
+        parser.add_argument('--no-archive', action='store_true', help='Tol\'ko sozdat\' sektsii')
+
+    def handle(self, *args, **options):
+        tables = options['tables'] or partitions.tables()
+        for table in tables:
+            created = partitions.ensure_partitions(table, options['months_ahead'])
+            self.stdout.write(f'{table}: created {len(created)} partitions')
+            if options['no_archive']:
+                continue
+            archived = partitions.archive_old(table, options['retain_months'])
+            for month in archived:
+                self.stdout.write(f'{table}: archived {month:%Y-%m}')
+        self.stdout.write(self.style.SUCCESS('Partitions are up to date'))
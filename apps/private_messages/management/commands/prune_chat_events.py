@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.private_messages import changelog
+
+
+class Command(BaseCommand):
+    help = 'Udalit\' sobytiya ChatEvent starshe CHAT_SYNC["RETENTION_DAYS"]'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Hranit\' sobytiya za stol\'ko dnei')
+
+    def handle(self, *args, **options):
+        deleted = changelog.prune(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} chat events'))
@@ -0,0 +1,293 @@
+"""Otlozhennaya zapis' soobshchenii chata (write-behind).
+
+V etom rezhime ChatConsumer ne zhdet INSERT: id soobshcheniya vydaetsya
+zaranee iz posledovatel'nosti tablitsy Message - po odnomu nextval na
+soobshchenie, chtoby id ostavalis' uporyadocheny vo vremeni mezhdu vorkerami
+(na etom derzhatsya watermark prochteniya, schetchiki neprochitannyh i
+Chat.last_message), soobshchenie kladetsya v bufer, rassylaetsya i
+podtverzhdaetsya srazu. flush() zabiraet
+paket iz bufera i v odnoi tranzaktsii delaet bulk_create soobshchenii,
+sobytii ChatEvent i uvedomlenii, odin UPDATE Chat.last_message na chat i
+po odnomu UPDATE schetchikov prochteniya na paru (chat, otpravitel').
+
+Garantii:
+  * LocalMessageBuffer - v pamyati protsessa, teryaetsya pri padenii
+    (razrabotka, odin vorker);
+  * RedisMessageBuffer - nastol'ko nadezhen, naskol'ko nastroena
+    persistentnost' Redis (appendfsync). Paket udalyaetsya iz bufera
+    tol'ko posle kommita; povtornyi flush propuskaet uzhe zapisannye id,
+    poetomu dostavka v BD - "hotya by raz" bez dublei.
+
+Perepolnenie (MAX_PENDING) reshaet OVERFLOW:
+  * 'sync'   - zapisat' soobshchenie srazu, kak bez bufera;
+  * 'block'  - zhdat' mesta do BLOCK_TIMEOUT, potom zapisat' srazu;
+  * 'reject' - otkazat' (BufferFull), klient poluchaet oshibku.
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from apps.notifications.models import Notification
+from .models import Chat, ChatEvent, ChatReadState, Message
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_SYNC = 'sync'
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_REJECT = 'reject'
+
+
+class BufferFull(Exception):
+    """Bufer perepolnen, a OVERFLOW = 'reject'"""
+
+
+class BaseMessageBuffer:
+    """Interfeis bufera: ochered' zapisei s podtverzhdeniem posle kommita"""
+
+    #: flush() nuzhno vyzyvat' v tom zhe protsesse (bufer v pamyati)
+    in_process = False
+
+    def push(self, record):
+        raise NotImplementedError
+
+    def size(self):
+        raise NotImplementedError
+
+    def peek(self, limit):
+        """Pervye <= limit zapisei bez udaleniya"""
+        raise NotImplementedError
+
+    def ack(self, count):
+        """Udalit' pervye count zapisei posle uspeshnogo kommita"""
+        raise NotImplementedError
+
+
+class LocalMessageBuffer(BaseMessageBuffer):
+    """Bufer v pamyati protsessa (odin vorker / razrabotka)"""
+
+    in_process = True
+
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        self._records = deque()
+
+    def push(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def size(self):
+        with self._lock:
+            return len(self._records)
+
+    def peek(self, limit):
+        with self._lock:
+            return [self._records[i] for i in range(min(limit, len(self._records)))]
+
+    def ack(self, count):
+        with self._lock:
+            for _ in range(min(count, len(self._records))):
+                self._records.popleft()
+
+
+class RedisMessageBuffer(BaseMessageBuffer):
+    """Bufer-spisok v Redis, obshchii dlya vseh vorkerov; flush - odin protsess"""
+
+    def __init__(self, location='redis://127.0.0.1:6379/1', key='messages:pending', **options):
+        import redis
+
+        self.client = redis.Redis.from_url(location)
+        self.key = key
+
+    def push(self, record):
+        self.client.rpush(self.key, json.dumps(record))
+
+    def size(self):
+        return self.client.llen(self.key)
+
+    def peek(self, limit):
+        return [json.loads(raw) for raw in self.client.lrange(self.key, 0, limit - 1)]
+
+    def ack(self, count):
+        self.client.ltrim(self.key, count, -1)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+_flusher = None
+
+
+def enabled():
+    return settings.MESSAGE_BUFFER['ENABLED']
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                options = settings.MESSAGE_BUFFER
+                _buffer = import_string(options['BACKEND'])(**options.get('OPTIONS', {}))
+    return _buffer
+
+
+def next_id():
+    """Id iz posledovatel'nosti Message v moment priema soobshcheniya"""
+    # Без резерва блоками: блок в памяти процесса выдавал бы id не по времени
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT nextval(pg_get_serial_sequence(%s, %s))', [Message._meta.db_table, 'id'])
+        return cursor.fetchone()[0]
+
+
+def submit(chat, sender, text, recipient_id=None):
+    """Prinyat' soobshchenie: vernut' Message s id (eshche ne zapisannyi, esli bufer ne polon)"""
+    options = settings.MESSAGE_BUFFER
+    message = Message(id=next_id(), chat=chat, sender=sender, text=text, created_at=timezone.now())
+    buffer = get_buffer()
+
+    if buffer.size() >= options['MAX_PENDING']:
+        policy = options['OVERFLOW']
+        if policy == OVERFLOW_REJECT:
+            raise BufferFull
+        if policy == OVERFLOW_BLOCK:
+            deadline = time.monotonic() + options['BLOCK_TIMEOUT']
+            while buffer.size() >= options['MAX_PENDING'] and time.monotonic() < deadline:
+                time.sleep(0.01)
+        if buffer.size() >= options['MAX_PENDING']:
+            # Места так и не появилось — обычная синхронная запись с сигналами
+            message.save(force_insert=True, check_participant=False)
+            return message
+
+    buffer.push({
+        'id': message.id,
+        'chat_id': chat.id,
+        'sender_id': sender.id,
+        'sender_username': sender.username,
+        'recipient_id': recipient_id,
+        'text': text,
+        'created_at': message.created_at.isoformat(),
+    })
+    if buffer.in_process:
+        _ensure_flusher()
+    return message
+
+
+def flush(limit=None):
+    """Zapisat' paket iz bufera v BD, vernut' chislo zapisei"""
+    buffer = get_buffer()
+    records = buffer.peek(limit or settings.MESSAGE_BUFFER['FLUSH_BATCH'])
+    if not records:
+        return 0
+
+    with transaction.atomic():
+        # Повтор после сбоя между коммитом и ack: уже записанные id пропускаются
+        written = set(Message.objects.filter(id__in=[r['id'] for r in records]).values_list('id', flat=True))
+        # Чат мог быть удалён, пока сообщение лежало в буфере
+        live_chats = set(Chat.objects.filter(id__in={r['chat_id'] for r in records}).values_list('id', flat=True))
+        fresh = [r for r in records if r['id'] not in written and r['chat_id'] in live_chats]
+
+        messages = [
+            Message(
+                id=r['id'],
+                chat_id=r['chat_id'],
+                sender_id=r['sender_id'],
+                text=r['text'],
+                created_at=parse_datetime(r['created_at']),
+            )
+            for r in fresh
+        ]
+        Message.objects.bulk_create(messages, ignore_conflicts=True)
+
+        ChatEvent.objects.bulk_create([
+            ChatEvent(
+                chat_id=r['chat_id'],
+                kind=ChatEvent.KIND_MESSAGE_CREATED,
+                actor_id=r['sender_id'],
+                message_id=r['id'],
+                payload={
+                    'text': r['text'],
+                    'sender': {'id': r['sender_id'], 'username': r['sender_username']},
+                    'created_at': r['created_at'],
+                    'is_edited': False,
+                },
+            )
+            for r in fresh
+        ])
+
+        content_type = ContentType.objects.get_for_model(Message)
+        Notification.objects.bulk_create([
+            Notification(
+                recipient_id=r['recipient_id'],
+                sender_id=r['sender_id'],
+                type='message',
+                content_type=content_type,
+                object_id=r['id'],
+            )
+            for r in fresh
+            if r['recipient_id'] and r['recipient_id'] != r['sender_id']
+        ])
+
+        # Один UPDATE last_message на чат за пакет
+        latest = {}
+        for message in messages:
+            if message.chat_id not in latest or message.id > latest[message.chat_id].id:
+                latest[message.chat_id] = message
+        for chat_id, message in latest.items():
+            # Синхронно записанное (переполнение) сообщение могло оказаться новее
+            Chat.objects.filter(
+                Q(last_message_id__isnull=True) | Q(last_message_id__lt=message.id), id=chat_id,
+            ).update(
+                last_message_id=message.id,
+                last_activity_at=message.created_at,
+            )
+
+        # Счётчики прочтения: по UPDATE на пару (чат, отправитель)
+        sent = Counter((m.chat_id, m.sender_id) for m in messages)
+        last_sent = {}
+        for message in messages:
+            key = (message.chat_id, message.sender_id)
+            last_sent[key] = max(last_sent.get(key, 0), message.id)
+        for (chat_id, sender_id), count in sent.items():
+            states = ChatReadState.objects.filter(chat_id=chat_id)
+            states.exclude(user_id=sender_id).update(unread_count=F('unread_count') + count)
+            states.filter(
+                user_id=sender_id,
+                last_read_message_id__lt=last_sent[(chat_id, sender_id)],
+            ).update(last_read_message_id=last_sent[(chat_id, sender_id)])
+
+    buffer.ack(len(records))
+    return len(records)
+
+
+def _ensure_flusher():
+    """Dlya bufera v pamyati flush idet v fonovom potoke etogo zhe protsessa"""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _buffer_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=run_flusher, name='message-buffer-flusher', daemon=True)
+            _flusher.start()
+
+
+def run_flusher(interval=None):
+    interval = interval or settings.MESSAGE_BUFFER['FLUSH_INTERVAL']
+    while True:
+        time.sleep(interval)
+        try:
+            while flush():
+                pass
+        except Exception:
+            # Пакет остаётся в буфере и будет повторён следующим flush.
+            logger.exception('Message buffer flush failed')
+        finally:
+            close_old_connections()
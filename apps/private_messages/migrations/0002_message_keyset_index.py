@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('private_messages', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat', '-created_at', '-id'], name='private_mes_chat_id_8525fc_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+def fill_dm_keys(apps, schema_editor):
+    # Ключ получает самый старый чат каждой пары; дубли, созданные гонкой, остаются без ключа
+    schema_editor.execute(
+        'UPDATE private_messages_chat SET dm_key = pairs.dm_key '
+        'FROM ('
+        '    SELECT chat_id, dm_key, ROW_NUMBER() OVER (PARTITION BY dm_key ORDER BY created_at, chat_id) AS place '
+        '    FROM ('
+        "        SELECT p.chat_id, MIN(p.user_id)::text || ':' || MAX(p.user_id)::text AS dm_key, c.created_at "
+        '        FROM private_messages_chat_participants p '
+        '        JOIN private_messages_chat c ON c.id = p.chat_id '
+        '        GROUP BY p.chat_id, c.created_at '
+        '        HAVING COUNT(*) = 2'
+        '    ) dms'
+        ') pairs '
+        'WHERE pairs.chat_id = private_messages_chat.id AND pairs.place = 1'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('private_messages', '0002_message_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='dm_key',
+            field=models.CharField(blank=True, editable=False, max_length=41, null=True, unique=True, verbose_name='Ключ пары DM'),
+        ),
+        migrations.RunPython(fill_dm_keys, migrations.RunPython.noop),
+    ]
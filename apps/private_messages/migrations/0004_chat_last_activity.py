@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def fill_last_activity(apps, schema_editor):
+    schema_editor.execute(
+        'UPDATE private_messages_chat SET last_activity_at = COALESCE('
+        '(SELECT m.created_at FROM private_messages_message m WHERE m.id = private_messages_chat.last_message_id), '
+        'private_messages_chat.created_at)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('private_messages', '0003_chat_dm_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последняя активность'),
+        ),
+        migrations.RunPython(fill_last_activity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['-last_activity_at', '-id'], name='private_mes_last_ac_9404f2_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_read_states(apps, schema_editor):
+    # Watermark — перед первым непрочитанным чужим сообщением, иначе последнее сообщение чата
+    schema_editor.execute(
+        'INSERT INTO private_messages_chatreadstate (chat_id, user_id, last_read_message_id, unread_count) '
+        'SELECT p.chat_id, p.user_id, COALESCE('
+        '    (SELECT MIN(m.id) - 1 FROM private_messages_message m '
+        '     WHERE m.chat_id = p.chat_id AND m.sender_id <> p.user_id AND NOT m.is_read), '
+        '    (SELECT MAX(m.id) FROM private_messages_message m WHERE m.chat_id = p.chat_id), '
+        '    0), 0 '
+        'FROM private_messages_chat_participants p'
+    )
+    schema_editor.execute(
+        'UPDATE private_messages_chatreadstate SET unread_count = ('
+        '    SELECT COUNT(*) FROM private_messages_message m '
+        '    WHERE m.chat_id = private_messages_chatreadstate.chat_id '
+        '      AND m.sender_id <> private_messages_chatreadstate.user_id '
+        '      AND m.id > private_messages_chatreadstate.last_read_message_id)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('private_messages', '0004_chat_last_activity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_message_id', models.BigIntegerField(default=0, verbose_name='Последнее прочитанное сообщение')),
+                ('unread_count', models.PositiveIntegerField(default=0, verbose_name='Непрочитанные')),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='private_messages.chat', verbose_name='Чат')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_read_states', to=settings.AUTH_USER_MODEL, verbose_name='Участник')),
+            ],
+            options={
+                'verbose_name': 'Состояние прочтения',
+                'verbose_name_plural': 'Состояния прочтения',
+                'constraints': [models.UniqueConstraint(fields=('chat', 'user'), name='unique_chat_read_state')],
+            },
+        ),
+        migrations.RunPython(fill_read_states, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='private_mes_chat_id_d91443_idx',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
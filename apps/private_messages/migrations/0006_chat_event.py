@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('private_messages', '0005_chat_read_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('message_created', 'Новое сообщение'), ('message_edited', 'Сообщение изменено'), ('message_deleted', 'Сообщение удалено'), ('read', 'Прочтение')], max_length=20, verbose_name='Тип')),
+                ('message_id', models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='Сообщение')),
+                ('payload', models.JSONField(default=dict, verbose_name='Данные')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата создания')),
+                ('actor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор события')),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='private_messages.chat', verbose_name='Чат')),
+            ],
+            options={
+                'verbose_name': 'Событие чата',
+                'verbose_name_plural': 'События чатов',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['chat', 'id'], name='private_mes_chat_id_b1dc13_idx')],
+            },
+        ),
+    ]
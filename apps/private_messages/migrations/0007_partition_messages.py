@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from apps.api.partitions import convert_to_partitioned
+
+
+def partition_messages(apps, schema_editor):
+    convert_to_partitioned(schema_editor, 'private_messages_message')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('private_messages', '0006_chat_event'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chat',
+            name='last_message',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='private_messages.message', verbose_name='Последнее сообщение'),
+        ),
+        migrations.RunPython(partition_messages, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
@@ -10,21 +12,33 @@ class ChatManager(models.Manager):
     
     def get_or_create_dm(self, user1, user2):
         """Получить или создать Direct Message между двумя пользователями"""
-        if user1.id > user2.id:
-            user1, user2 = user2, user1
-        
-        # Поиск существующего чата
-        chats = self.all().prefetch_related('participants')
-        for chat in chats:
-            participants = set(chat.participants.values_list('id', flat=True))
-            if participants == {user1.id, user2.id}:
-                return chat, False
-        
-        # Создание нового
-        chat = self.create()
-        chat.participants.add(user1, user2)
+        key = Chat.dm_key_for(user1.id, user2.id)
+        chat = self.filter(dm_key=key).first()
+        if chat is not None:
+            return chat, False
+
+        # Уникальный dm_key: из двух параллельных запросов создаст чат только один
+        try:
+            with transaction.atomic():
+                chat = self.create(dm_key=key)
+                chat.participants.add(user1, user2)
+        except IntegrityError:
+            return self.get(dm_key=key), False
         return chat, True
 
+    def inbox(self, user):
+        """Чаты пользователя с участниками, последним сообщением и unread_count
+        за постоянное число запросов"""
+        unread = ChatReadState.objects.filter(chat=OuterRef('pk'), user=user).values('unread_count')
+        return self.filter(participants=user).select_related(
+            'last_message__sender',
+        ).prefetch_related(
+            Prefetch('participants', queryset=User.objects.only('id', 'username', 'email')),
+            Prefetch('read_states', queryset=ChatReadState.objects.only('chat', 'user', 'last_read_message_id')),
+        ).annotate(
+            unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), 0),
+        )
+
 
 class Chat(models.Model):
     """Chat между двумя пользователями (Direct Message)"""
@@ -39,6 +53,7 @@ class Chat(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
+        db_constraint=False,  # Message секционирована, FK на её id невозможен
         related_name='+',
         verbose_name='Последнее сообщение'
     )
@@ -47,6 +62,18 @@ class Chat(models.Model):
         db_index=True,  # ✅ индекс для сортировки
         verbose_name='Дата создания'
     )
+    dm_key = models.CharField(
+        max_length=41,
+        null=True,
+        blank=True,
+        unique=True,  # один DM на пару, поиск по индексу
+        editable=False,
+        verbose_name='Ключ пары DM'
+    )
+    last_activity_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Последняя активность'
+    )
     
     objects = ChatManager()  # ✅ custom manager
     
@@ -55,6 +82,7 @@ class Chat(models.Model):
         verbose_name_plural = 'Чаты'
         indexes = [  # ✅ индекс для быстрого получения чатов
             models.Index(fields=['-created_at']),
+            models.Index(fields=['-last_activity_at', '-id']),  # keyset-пагинация списка чатов
         ]
         ordering = ['-created_at']
 
@@ -62,9 +90,16 @@ class Chat(models.Model):
         usernames = ', '.join([u.username for u in self.participants.all()[:2]])
         return f'Chat ({usernames})'
     
+    @staticmethod
+    def dm_key_for(user1_id, user2_id) -> str:
+        """Канонический ключ пары: '<меньший id>:<больший id>'"""
+        low, high = sorted((user1_id, user2_id))
+        return f'{low}:{high}'
+
     def unread_count_for_user(self, user) -> int:
         """Количество непрочитанных сообщений для пользователя"""
-        return self.messages.filter(is_read=False).exclude(sender=user).count()
+        state = self.read_states.filter(user=user).values_list('unread_count', flat=True).first()
+        return state or 0
 
 
 class Message(models.Model):
@@ -86,11 +121,6 @@ class Message(models.Model):
         max_length=2000,
         verbose_name='Текст'
     )
-    is_read = models.BooleanField(
-        default=False,
-        db_index=True,  # ✅ индекс для фильтра непрочитанных
-        verbose_name='Прочитано'
-    )
     created_at = models.DateTimeField(
         default=timezone.now,
         db_index=True,
@@ -110,29 +140,21 @@ class Message(models.Model):
         verbose_name_plural = 'Сообщения'
         ordering = ['-created_at']
         indexes = [  # ✅ индексы для производительности
-            models.Index(fields=['chat', 'is_read']),
             models.Index(fields=['sender', '-created_at']),
+            models.Index(fields=['chat', '-created_at', '-id']),  # keyset-пагинация сообщений
         ]
     
-    def save(self, *args, **kwargs):
-        """✅ Валидация: sender должен быть в participants"""
-        if not self.chat.participants.filter(pk=self.sender.id).exists():
+    def save(self, *args, check_participant=True, **kwargs):
+        """✅ Валидация: sender должен быть в participants (вызывающий может
+        отключить проверку, если уже знает состав чата)"""
+        if check_participant and not self.chat.participants.filter(pk=self.sender.id).exists():
             raise ValueError(f"{self.sender} не является участником чата {self.chat.id}")
         super().save(*args, **kwargs)
     
-    def mark_as_read(self) -> None:
-        """✅ Отметить сообщение как прочитанное"""
-        if not self.is_read:
-            self.is_read = True
-            self.save(update_fields=['is_read'])
-    
     @classmethod
     def mark_chat_as_read(cls, chat, user) -> int:
-        """✅ Отметить все сообщения в чате как прочитанные для пользователя"""
-        return cls.objects.filter(
-            chat=chat,
-            is_read=False
-        ).exclude(sender=user).update(is_read=True)
+        """✅ Отметить чат прочитанным до последнего сообщения, вернуть watermark"""
+        return ChatReadState.mark_read(chat, user)
     
     def edit(self, new_text: str) -> None:
         """✅ Отредактировать сообщение"""
@@ -146,4 +168,136 @@ class Message(models.Model):
         return self.sender == user
     
     def __str__(self):
-        return f'Message from {self.sender.username} in chat {self.chat.id}'
\ No newline at end of file
+        return f'Message from {self.sender.username} in chat {self.chat.id}'
+
+
+class ChatReadState(models.Model):
+    """Состояние прочтения чата участником: watermark и счётчик непрочитанных"""
+
+    chat = models.ForeignKey(
+        Chat,
+        on_delete=models.CASCADE,
+        related_name='read_states',
+        verbose_name='Чат'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='chat_read_states',
+        verbose_name='Участник'
+    )
+    last_read_message_id = models.BigIntegerField(
+        default=0,  # id сообщений растут: всё, что не больше watermark, прочитано
+        verbose_name='Последнее прочитанное сообщение'
+    )
+    unread_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Непрочитанные'
+    )
+
+    class Meta:
+        verbose_name = 'Состояние прочтения'
+        verbose_name_plural = 'Состояния прочтения'
+        constraints = [
+            models.UniqueConstraint(fields=['chat', 'user'], name='unique_chat_read_state'),
+        ]
+
+    @classmethod
+    def mark_read(cls, chat, user) -> int:
+        """Одно обновление строки вместо UPDATE всех непрочитанных сообщений.
+
+        Watermark читается из таблицы сообщений, а не из chat.last_message_id,
+        который мог устареть. Счётчик не обнуляется, а уменьшается на число
+        чужих сообщений между старым и новым watermark: сообщение, закоммиченное
+        после чтения watermark, остаётся непрочитанным.
+        """
+        watermark = Message.objects.filter(chat=chat).order_by('-created_at', '-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        newly_read = Message.objects.filter(
+            chat_id=chat.pk,
+            id__gt=OuterRef('last_read_message_id'),
+            id__lte=watermark,
+        ).exclude(sender_id=user.pk).order_by().values('chat_id').annotate(total=Count('id')).values('total')
+        cls.objects.filter(chat=chat, user=user).update(
+            last_read_message_id=Greatest(F('last_read_message_id'), watermark),
+            unread_count=Greatest(
+                F('unread_count') - Coalesce(Subquery(newly_read, output_field=IntegerField()), 0),
+                0,
+            ),
+        )
+        ChatEvent.objects.create(
+            chat=chat,
+            kind=ChatEvent.KIND_READ,
+            actor=user,
+            message_id=watermark or None,
+            payload={'last_read_message_id': watermark},
+        )
+        return watermark
+
+    def is_read(self, message) -> bool:
+        return message.sender_id == self.user_id or message.id <= self.last_read_message_id
+
+    def __str__(self):
+        return f'ReadState(chat={self.chat_id}, user={self.user_id}, unread={self.unread_count})'
+
+
+class ChatEvent(models.Model):
+    """Append-only журнал изменений чатов для дельта-синхронизации клиентов"""
+
+    KIND_MESSAGE_CREATED = 'message_created'
+    KIND_MESSAGE_EDITED = 'message_edited'
+    KIND_MESSAGE_DELETED = 'message_deleted'
+    KIND_READ = 'read'
+
+    KIND_CHOICES = [
+        (KIND_MESSAGE_CREATED, 'Новое сообщение'),
+        (KIND_MESSAGE_EDITED, 'Сообщение изменено'),
+        (KIND_MESSAGE_DELETED, 'Сообщение удалено'),
+        (KIND_READ, 'Прочтение'),
+    ]
+
+    chat = models.ForeignKey(
+        Chat,
+        on_delete=models.CASCADE,
+        related_name='events',
+        verbose_name='Чат'
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=KIND_CHOICES,
+        verbose_name='Тип'
+    )
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name='Автор события'
+    )
+    message_id = models.BigIntegerField(
+        null=True,
+        blank=True,  # не FK: событие удаления переживает само сообщение
+        db_index=True,  # курсор по id сообщения
+        verbose_name='Сообщение'
+    )
+    payload = models.JSONField(
+        default=dict,
+        verbose_name='Данные'
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,  # для удаления старых событий
+        verbose_name='Дата создания'
+    )
+
+    class Meta:
+        verbose_name = 'Событие чата'
+        verbose_name_plural = 'События чатов'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['chat', 'id']),  # события чатов пользователя после курсора
+        ]
+
+    def __str__(self):
+        return f'ChatEvent({self.id}, chat={self.chat_id}, {self.kind})'
@@ -0,0 +1,177 @@
+"""Prisutstvie (online/offline) i indikator nabora teksta bez zapisei v BD.
+
+Vse sostoyanie zhivet v hranilishche s TTL: v pamyati protsessa (odin
+uzel) ili v lokal'nom Redis (neskol'ko uzlov). Kazhdyi WebSocket -
+otdel'noe soedinenie polzovatelya; polzovatel' online, poka u nego est'
+hotya by odno soedinenie s neistekshim TTL. Esli uzel upal bez
+disconnect, soedinenie prosto istekaet.
+
+Nabor teksta ogranichivaetsya na servere: ne chashche odnogo sobytiya na
+(chat, polzovatel') za TYPING_INTERVAL, ostal'nye kadry proglatyvayutsya.
+Klient pryachet indikator sam cherez expires_in.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def presence_group(user_id):
+    """Gruppa nablyudatelei za prisutstviem polzovatelya"""
+    return f'presence_{user_id}'
+
+
+class BasePresenceStore:
+    """Interfeis hranilishcha; vremya - v sekundah"""
+
+    def connect(self, user_id, connection_id, ttl):
+        """Zaregistrirovat' ili prodlit' soedinenie; True, esli polzovatel' tol'ko chto stal online"""
+        raise NotImplementedError
+
+    def disconnect(self, user_id, connection_id):
+        """Ubrat' soedinenie; True, esli u polzovatelya ne ostalos' zhivyh soedinenii"""
+        raise NotImplementedError
+
+    def online(self, user_ids):
+        """Mnozhestvo id, u kotoryh est' zhivoe soedinenie"""
+        raise NotImplementedError
+
+    def allow_typing(self, chat_id, user_id, interval):
+        """True, esli sobytie nabora mozhno razoslat' (ne chashche interval)"""
+        raise NotImplementedError
+
+
+class LocalPresenceStore(BasePresenceStore):
+    """Hranilishche v pamyati protsessa (odin uzel / razrabotka)"""
+
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        self._connections = {}  # user_id -> {connection_id: expires_at}
+        self._typing = {}  # (chat_id, user_id) -> expires_at
+
+    def _alive(self, user_id, now):
+        connections = self._connections.get(user_id, {})
+        for connection_id in [c for c, expires in connections.items() if expires <= now]:
+            del connections[connection_id]
+        if not connections:
+            self._connections.pop(user_id, None)
+        return connections
+
+    def connect(self, user_id, connection_id, ttl):
+        now = time.monotonic()
+        with self._lock:
+            was_online = bool(self._alive(user_id, now))
+            self._connections.setdefault(user_id, {})[connection_id] = now + ttl
+            return not was_online
+
+    def disconnect(self, user_id, connection_id):
+        with self._lock:
+            self._connections.get(user_id, {}).pop(connection_id, None)
+            return not self._alive(user_id, time.monotonic())
+
+    def online(self, user_ids):
+        now = time.monotonic()
+        with self._lock:
+            return {user_id for user_id in user_ids if self._alive(user_id, now)}
+
+    def allow_typing(self, chat_id, user_id, interval):
+        now = time.monotonic()
+        with self._lock:
+            if self._typing.get((chat_id, user_id), 0) > now:
+                return False
+            # Заодно выбросить истёкшие записи, чтобы словарь не рос
+            for key in [k for k, expires in self._typing.items() if expires <= now]:
+                del self._typing[key]
+            self._typing[(chat_id, user_id)] = now + interval
+            return True
+
+
+class RedisPresenceStore(BasePresenceStore):
+    """Hranilishche v lokal'nom Redis, obshchee dlya vseh uzlov.
+
+    Soedineniya polzovatelya - ZSET s vremenem istecheniya v kachestve
+    score; nabor - klyuch s PX i NX.
+    """
+
+    CONNECT = """
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    local was = redis.call('ZCARD', KEYS[1])
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[3])
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    return was
+    """
+
+    DISCONNECT = """
+    redis.call('ZREM', KEYS[1], ARGV[2])
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    return redis.call('ZCARD', KEYS[1])
+    """
+
+    def __init__(self, location='redis://127.0.0.1:6379/1', prefix='presence', **options):
+        import redis
+
+        self.client = redis.Redis.from_url(location)
+        self.prefix = prefix
+        self._connect = self.client.register_script(self.CONNECT)
+        self._disconnect = self.client.register_script(self.DISCONNECT)
+
+    def _key(self, *parts):
+        return ':'.join([self.prefix, *map(str, parts)])
+
+    def connect(self, user_id, connection_id, ttl):
+        now = time.time()
+        was = self._connect(
+            keys=[self._key('user', user_id)],
+            args=[now, now + ttl, connection_id, int(ttl) + 1],
+        )
+        return was == 0
+
+    def disconnect(self, user_id, connection_id):
+        left = self._disconnect(keys=[self._key('user', user_id)], args=[time.time(), connection_id])
+        return left == 0
+
+    def online(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zcount(self._key('user', user_id), f'({now}', '+inf')
+        return {user_id for user_id, count in zip(user_ids, pipe.execute()) if count}
+
+    def allow_typing(self, chat_id, user_id, interval):
+        return bool(self.client.set(
+            self._key('typing', chat_id, user_id), 1, px=int(interval * 1000), nx=True,
+        ))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                options = settings.PRESENCE
+                _store = import_string(options['BACKEND'])(**options.get('OPTIONS', {}))
+    return _store
+
+
+def connect(user_id, connection_id):
+    return get_store().connect(user_id, connection_id, settings.PRESENCE['TTL'])
+
+
+def disconnect(user_id, connection_id):
+    return get_store().disconnect(user_id, connection_id)
+
+
+def online(user_ids):
+    return get_store().online(user_ids)
+
+
+def allow_typing(chat_id, user_id):
+    return get_store().allow_typing(chat_id, user_id, settings.PRESENCE['TYPING_INTERVAL'])
@@ -2,5 +2,5 @@ from django.urls import re_path
 from . import consumers
 
 websocket_urlpatterns = [
-    re_path(r'ws/chats/(?P<chat_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/chats/$', consumers.ChatConsumer.as_asgi()),
 ]
\ No newline at end of file
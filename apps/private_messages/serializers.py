@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Chat, Message
+from .models import Chat, Message, ChatEvent, ChatReadState
 
 User = get_user_model()
 
@@ -11,24 +11,64 @@ class UserShortSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email']  
     
+def read_watermarks(context, chat_id):
+    """{user_id: last_read_message_id} chata, odin zapros na chat za ves' otvet"""
+    watermarks = context.setdefault('read_watermarks', {})
+    if chat_id not in watermarks:
+        watermarks[chat_id] = dict(
+            ChatReadState.objects.filter(chat_id=chat_id).values_list('user_id', 'last_read_message_id')
+        )
+    return watermarks[chat_id]
+
+
 class MessageSerializer(serializers.ModelSerializer):
     sender = UserShortSerializer(read_only=True)
+    is_read = serializers.SerializerMethodField()
 
     class Meta:
         model = Message
         fields = ['id', 'chat', 'sender', 'text', 'is_read', 'created_at']  
         read_only_fields = ['id', 'sender', 'is_read', 'created_at', 'chat']
 
+    def get_is_read(self, obj):
+        # Прочитано, когда watermark всех остальных участников дошёл до сообщения
+        others = [
+            last_read for user_id, last_read in read_watermarks(self.context, obj.chat_id).items()
+            if user_id != obj.sender_id
+        ]
+        return bool(others) and all(obj.id <= last_read for last_read in others)
+
 class ChatSerializer(serializers.ModelSerializer):
     participants = UserShortSerializer(many=True, read_only=True)
-    last_message = serializers.SerializerMethodField()
+    last_message = MessageSerializer(read_only=True)
+    unread_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Chat
-        fields = ['id', 'participants', 'last_message', 'created_at']
+        fields = ['id', 'participants', 'last_message', 'unread_count', 'last_activity_at', 'created_at']
+
+    def to_representation(self, instance):
+        # Watermark'и из prefetch inbox — без запроса на каждый last_message
+        cache = getattr(instance, '_prefetched_objects_cache', {})
+        if 'read_states' in cache:
+            self.context.setdefault('read_watermarks', {})[instance.pk] = {
+                state.user_id: state.last_read_message_id for state in cache['read_states']
+            }
+        return super().to_representation(instance)
 
-    def get_last_message(self, obj):
-        last = obj.messages.order_by('-created_at').first()  
-        if last:
-            return MessageSerializer(last).data
-        return None
\ No newline at end of file
+    def get_unread_count(self, obj):
+        # В списке приходит аннотацией из Chat.objects.inbox
+        count = getattr(obj, 'unread_count', None)
+        if count is not None:
+            return count
+        request = self.context.get('request')
+        if request is None:
+            return 0
+        return obj.unread_count_for_user(request.user)
+
+
+class ChatEventSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = ChatEvent
+        fields = ['id', 'chat', 'kind', 'actor', 'message_id', 'payload', 'created_at']
@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.db import transaction
-from .models import Message, Chat
+from .models import Message, Chat, ChatReadState, ChatEvent
+from .events import send_to_users_sync
+from . import changelog
 from apps.notifications.utils import create_notification
 
 
@@ -10,7 +13,8 @@ def update_chat_last_message(sender, instance, created, **kwargs):
     """✅ Обновить последнее сообщение в чате"""
     if created:
         instance.chat.last_message = instance
-        instance.chat.save(update_fields=['last_message'])
+        instance.chat.last_activity_at = instance.created_at
+        instance.chat.save(update_fields=['last_message', 'last_activity_at'])
 
 
 @receiver(post_delete, sender=Message)
@@ -20,6 +24,97 @@ def update_chat_last_message_on_delete(sender, instance, **kwargs):
     last_msg = chat.messages.first()  # первое из-за ordering = ['-created_at']
     if last_msg:
         chat.last_message = last_msg
+        chat.last_activity_at = last_msg.created_at
     else:
         chat.last_message = None
-    chat.save(update_fields=['last_message'])
\ No newline at end of file
+        chat.last_activity_at = chat.created_at
+    chat.save(update_fields=['last_message', 'last_activity_at'])
+
+
+@receiver(m2m_changed, sender=Chat.participants.through)
+def create_read_states(sender, instance, action, reverse, pk_set, **kwargs):
+    """Строка состояния прочтения на каждого нового участника"""
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        states = [ChatReadState(chat_id=chat_id, user=instance) for chat_id in pk_set]
+    else:
+        states = [ChatReadState(chat=instance, user_id=user_id) for user_id in pk_set]
+    ChatReadState.objects.bulk_create(states, ignore_conflicts=True)
+
+
+@receiver(m2m_changed, sender=Chat.participants.through)
+def refresh_socket_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сокеты участников держат состав чата в памяти — попросить их перечитать"""
+    if reverse:
+        # При очистке со стороны пользователя чаты известны только до удаления
+        if action == 'pre_clear':
+            chat_ids = list(instance.chats.values_list('id', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            chat_ids = list(pk_set)
+        else:
+            return
+        changed = {chat_id: {instance.id} for chat_id in chat_ids}
+    elif action == 'pre_clear':
+        changed = {instance.id: set(instance.participants.values_list('id', flat=True))}
+    elif action in ('post_add', 'post_remove'):
+        changed = {instance.id: set(pk_set)}
+    else:
+        return
+
+    def _notify():
+        for chat_id, user_ids in changed.items():
+            # Оставшимся участникам тоже: у них в кеше список получателей
+            user_ids = user_ids | set(
+                Chat.participants.through.objects.filter(chat_id=chat_id).values_list('user_id', flat=True)
+            )
+            send_to_users_sync(user_ids, {'type': 'chat.members', 'chat_id': chat_id})
+
+    transaction.on_commit(_notify)
+
+
+@receiver(post_save, sender=Message)
+def count_unread_on_create(sender, instance, created, **kwargs):
+    if not created:
+        return
+    states = ChatReadState.objects.filter(chat_id=instance.chat_id)
+    states.exclude(user_id=instance.sender_id).update(unread_count=F('unread_count') + 1)
+    # Своё сообщение отправитель уже прочитал
+    states.filter(
+        user_id=instance.sender_id,
+        last_read_message_id__lt=instance.id,
+    ).update(last_read_message_id=instance.id)
+
+
+@receiver(post_delete, sender=Message)
+def count_unread_on_delete(sender, instance, **kwargs):
+    ChatReadState.objects.filter(
+        chat_id=instance.chat_id,
+        last_read_message_id__lt=instance.id,
+        unread_count__gt=0,
+    ).exclude(user_id=instance.sender_id).update(unread_count=F('unread_count') - 1)
+
+
+@receiver(post_save, sender=Message)
+def log_message_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        kind = ChatEvent.KIND_MESSAGE_CREATED
+    elif update_fields is None or 'text' in update_fields:
+        kind = ChatEvent.KIND_MESSAGE_EDITED
+    else:
+        return
+    changelog.record(
+        instance.chat_id, kind,
+        actor_id=instance.sender_id,
+        message_id=instance.id,
+        payload=changelog.message_payload(instance),
+    )
+
+
+@receiver(post_delete, sender=Message)
+def log_message_deleted(sender, instance, **kwargs):
+    changelog.record(
+        instance.chat_id, ChatEvent.KIND_MESSAGE_DELETED,
+        actor_id=instance.sender_id,
+        message_id=instance.id,
+    )
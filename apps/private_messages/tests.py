@@ -1,3 +1,63 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TransactionTestCase
 
-# Create your tests here.
+from apps.api.partitions import convert_to_partitioned, partitions
+
+
+class ConvertToPartitionedTests(TransactionTestCase):
+    """Sektsionirovanie tablits (apps/api/partitions.py, migratsii 0007 i notifications 0003)"""
+
+    table = 'partition_probe'
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE {self.table} ('
+                f'id bigserial PRIMARY KEY, '
+                f'created_at timestamptz NOT NULL, '
+                f'owner_id integer NOT NULL CHECK (owner_id > 0))'
+            )
+            cursor.execute(f'CREATE INDEX {self.table}_owner_idx ON {self.table} (owner_id, created_at)')
+            cursor.execute(
+                f"INSERT INTO {self.table} (created_at, owner_id) VALUES "
+                f"(now() - interval '40 days', 1), (now(), 2)"
+            )
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table} CASCADE')
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}_legacy CASCADE')
+
+    def _relkind(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT relkind FROM pg_class WHERE relname = %s', [name])
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def test_migrated_tables_are_partitioned(self):
+        self.assertEqual(self._relkind('private_messages_message'), 'p')
+        self.assertEqual(self._relkind('notifications_notification'), 'p')
+
+    def test_convert_keeps_rows_names_and_sequence(self):
+        with connection.schema_editor() as schema_editor:
+            convert_to_partitioned(schema_editor, self.table, months_ahead=1)
+
+        self.assertEqual(self._relkind(self.table), 'p')
+        self.assertIsNone(self._relkind(f'{self.table}_legacy'))
+        self.assertEqual(self._relkind(f'{self.table}_owner_idx'), 'I')
+        self.assertGreaterEqual(len(partitions(self.table)), 3)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT a.attname FROM pg_index i '
+                'JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) '
+                'WHERE i.indrelid = %s::regclass AND i.indisprimary ORDER BY a.attname',
+                [self.table],
+            )
+            self.assertEqual([row[0] for row in cursor.fetchall()], ['created_at', 'id'])
+
+            cursor.execute(f'SELECT owner_id FROM {self.table} ORDER BY id')
+            self.assertEqual([row[0] for row in cursor.fetchall()], [1, 2])
+
+            cursor.execute(f'INSERT INTO {self.table} (created_at, owner_id) VALUES (now(), 3) RETURNING id')
+            self.assertEqual(cursor.fetchone()[0], 3)
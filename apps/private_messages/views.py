@@ -1,11 +1,14 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
-from django.shortcuts import get_object_or_404
+from django.conf import settings
 from .models import Chat, Message
-from .serializers import ChatSerializer, MessageSerializer
+from .serializers import ChatSerializer, MessageSerializer, ChatEventSerializer
+from .events import send_to_users_sync
+from . import changelog
 from django.contrib.auth import get_user_model
+from apps.api.pagination import KeysetPagination, ChatKeysetPagination
+from apps.api import partitions
 
 User = get_user_model()
 
@@ -15,18 +18,16 @@ class ChatViewSet(viewsets.ModelViewSet):
     
     serializer_class = ChatSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ChatKeysetPagination
     
     def get_queryset(self):
-        user = self.request.user
-        return Chat.objects.filter(
-            participants=user
-        ).prefetch_related('participants', 'messages').order_by('-created_at')
+        return Chat.objects.inbox(self.request.user)
     
-    @action(detail=True, methods=['get'], url_path='messages')
+    @action(detail=True, methods=['get'], url_path='messages', pagination_class=KeysetPagination)
     def get_messages(self, request, pk=None):
         """✅ Получить сообщения чата с pagination"""
         chat = self.get_object()
-        messages = chat.messages.order_by('-created_at')
+        messages = chat.messages.select_related('sender')
         
         # ✅ Pagination
         page = self.paginate_queryset(messages)
@@ -97,30 +98,86 @@ class ChatViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
         )
     
+    @action(detail=True, methods=['get'], url_path='history')
+    def history(self, request, pk=None):
+        """Архив сообщений из отсоединённых секций: без month — список месяцев"""
+        chat = self.get_object()
+        table = Message._meta.db_table
+        month = request.query_params.get('month')
+        if not month:
+            months = partitions.archived_months(table, chat.id)
+            return Response({'months': [f'{m:%Y-%m}' for m in months]})
+        try:
+            month = partitions.parse_month(month)
+        except ValueError:
+            return Response({'detail': 'month must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+        rows = partitions.read_archive(table, month, chat.id)
+        results = [
+            {
+                'id': int(row['id']),
+                'chat': chat.id,
+                'sender': int(row['sender_id']),
+                'text': row['text'],
+                'created_at': row['created_at'],
+                'is_edited': row['is_edited'] == 't',
+            }
+            for row in rows
+        ]
+        return Response({'month': f'{month:%Y-%m}', 'results': results})
+
+    @action(detail=False, methods=['get'], url_path='sync')
+    def sync(self, request):
+        """Все изменения по чатам пользователя после события since (или сообщения since_message)"""
+        try:
+            since = request.query_params.get('since')
+            since_message = request.query_params.get('since_message')
+            limit = min(int(request.query_params.get('limit', 0)) or settings.CHAT_SYNC['LIMIT'],
+                        settings.CHAT_SYNC['LIMIT'])
+            if since is not None:
+                since = int(since)
+            elif since_message is not None:
+                since = changelog.event_for_message(int(since_message))
+                if since is None:
+                    return Response({'detail': 'Unknown message, full resync required'}, status=status.HTTP_410_GONE)
+        except ValueError:
+            return Response(
+                {'detail': 'since, since_message and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Первый запуск: только курсор, историю клиент листает через /messages/
+        if since is None:
+            return Response({'events': [], 'cursor': changelog.latest_id(), 'has_more': False})
+
+        try:
+            events, has_more = changelog.since(request.user, since, limit)
+        except changelog.CursorExpired:
+            return Response({'detail': 'Cursor expired, full resync required'}, status=status.HTTP_410_GONE)
+        return Response({
+            'events': ChatEventSerializer(events, many=True).data,
+            'cursor': events[-1].id if events else since,
+            'has_more': has_more,
+        })
+
     @action(detail=True, methods=['post'], url_path='mark-read')
     def mark_read(self, request, pk=None):
         """Отметить все сообщения в чате как прочитанные"""
         chat = self.get_object()
         user = request.user
         
-        # ✅ Используем метод модели
-        updated = Message.mark_chat_as_read(chat, user)
+        # ✅ Одно обновление watermark участника
+        watermark = Message.mark_chat_as_read(chat, user)
         
-        # Отправить в WebSocket об обновлении
-        from asgiref.sync import async_to_sync
-        from channels.layers import get_channel_layer
-        
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'chat_{chat.id}',
-            {
-                'type': 'chat.read',  # ✅ правильный тип
-                'chat_id': chat.id,
-                'reader_id': user.id,
-            }
-        )
+        # Отправить в WebSocket участникам об обновлении
+        participant_ids = list(chat.participants.values_list('id', flat=True))
+        send_to_users_sync(participant_ids, {
+            'type': 'chat.read',  # ✅ правильный тип
+            'chat_id': chat.id,
+            'reader_id': user.id,
+            'last_read_message_id': watermark,
+        })
         
         return Response(
-            {'detail': f'Marked {updated} messages as read'},
+            {'detail': 'Chat marked as read', 'last_read_message_id': watermark},
             status=status.HTTP_200_OK
         )
\ No newline at end of file
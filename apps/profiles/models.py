@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from apps.images import pipeline
 
 User = get_user_model()
 
@@ -20,6 +21,11 @@ class Profile(models.Model):
         null=True,
         blank=True,
     )
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,  # заполняет apps.images.pipeline
+    )
     bio = models.TextField(
         max_length=500,
         blank=True,
@@ -54,4 +60,6 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         try:
             instance.profile.save()
         except Profile.DoesNotExist:
-            Profile.objects.create(user=instance)
\ No newline at end of file
+            Profile.objects.create(user=instance)
+
+pipeline.watch(Profile, 'avatar', 'avatar_variants')
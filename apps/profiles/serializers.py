@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from apps.images import pipeline
 from .models import Profile
 
 User = get_user_model()
@@ -14,12 +15,16 @@ class UserPublicSerializer(serializers.ModelSerializer):
 class ProfileSerializer(serializers.ModelSerializer):
     user = UserPublicSerializer(read_only=True)
     avatar = serializers.ImageField(required=False, allow_null=True)
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Profile
-        fields = ['id', 'user', 'avatar', 'bio', 'city', 'birthday', 'website', 'created_at', 'updated_at']
+        fields = ['id', 'user', 'avatar', 'avatar_variants', 'bio', 'city', 'birthday', 'website', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def get_avatar_variants(self, obj):
+        return pipeline.variant_urls(obj.avatar_variants, self.context.get('request'))
+
     def update(self, instance, validated_data):
         
         for attr, value in validated_data.items():
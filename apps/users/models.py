@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from apps.images import pipeline
 
 class User(AbstractUser):
     """Кастомная модель пользователя"""
@@ -13,6 +14,7 @@ class User(AbstractUser):
     address = models.CharField(max_length=255, blank=True, null=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
     avatar = models.ImageField(upload_to='images/', blank=True, null=True)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
@@ -28,3 +30,6 @@ class User(AbstractUser):
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
+
+
+pipeline.watch(User, 'avatar', 'avatar_variants')
@@ -17,6 +17,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_filters',
     'rest_framework',
     'drf_spectacular',
@@ -145,3 +146,155 @@ CHANNEL_LAYERS = {
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Материализованная лента
+FEED_TIMELINE_DEPTH = config('FEED_TIMELINE_DEPTH', default=500, cast=int)
+FEED_TIMELINE_TRIM_EVERY = config('FEED_TIMELINE_TRIM_EVERY', default=20, cast=int)
+
+# Буферизованные лайки: переключения копятся в буфере и периодически
+# сбрасываются в Like (manage.py flush_likes --loop для Redis-бэкенда)
+LIKE_BUFFER = {
+    'ENABLED': config('LIKE_BUFFER_ENABLED', default=False, cast=bool),
+    'BACKEND': config('LIKE_BUFFER_BACKEND', default='apps.posts.like_buffer.RedisLikeBuffer'),
+    'OPTIONS': {
+        'location': config('LIKE_BUFFER_REDIS_URL', default='redis://127.0.0.1:6379/1'),
+    },
+    'FLUSH_INTERVAL': config('LIKE_BUFFER_FLUSH_INTERVAL', default=2, cast=float),
+    'FLUSH_BATCH': 500,
+}
+
+# Кэш: локальная память по умолчанию, общий Redis при заданном REDIS_CACHE_URL
+REDIS_CACHE_URL = config('REDIS_CACHE_URL', default='')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        },
+        'feed': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+            'KEY_PREFIX': 'feed',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'feed': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'feed',
+            'OPTIONS': {'MAX_ENTRIES': config('FEED_CACHE_MAX_ENTRIES', default=10000, cast=int)},
+        },
+    }
+
+# Кэш ответов ленты; версия пользователя меняется при любом изменении его ленты.
+# По умолчанию только с общим Redis: bump() в LocMemCache не виден другим воркерам
+FEED_CACHE = {
+    'ENABLED': config('FEED_CACHE_ENABLED', default=bool(REDIS_CACHE_URL), cast=bool),
+    'ALIAS': 'feed',
+    'TIMEOUT': config('FEED_CACHE_TIMEOUT', default=60, cast=int),
+}
+
+# Ранжированная лента (?order=ranked); скоры пересчитывает manage.py update_feed_scores
+FEED_RANKING = {
+    'HALF_LIFE_HOURS': config('FEED_RANKING_HALF_LIFE_HOURS', default=12, cast=float),
+    'COMMENT_WEIGHT': 2,
+    'FRIEND_BONUS': 1,
+    'LOOKBACK_HOURS': 24,
+}
+
+# Фоновая обработка картинок (apps.images.pipeline): размер варианта — длинная сторона в px
+IMAGE_PIPELINE = {
+    'ENABLED': config('IMAGE_PIPELINE_ENABLED', default=True, cast=bool),
+    'WORKERS': config('IMAGE_PIPELINE_WORKERS', default=2, cast=int),
+    'VARIANTS': {
+        'thumb': 320,
+        'medium': 1080,
+    },
+    'FORMAT': 'WEBP',
+    'QUALITY': 80,
+}
+
+# Кэш социального графа (apps/friends/graph.py), сбрасывается сигналами Friendship/Follow.
+# По умолчанию только с общим Redis: сброс в LocMemCache не виден другим воркерам
+SOCIAL_GRAPH_CACHE_ENABLED = config('SOCIAL_GRAPH_CACHE_ENABLED', default=bool(REDIS_CACHE_URL), cast=bool)
+SOCIAL_GRAPH_CACHE_TIMEOUT = config('SOCIAL_GRAPH_CACHE_TIMEOUT', default=3600, cast=int)
+
+# «Возможно, вы знакомы» (apps/friends/suggestions.py); очередь разбирает manage.py refresh_friend_suggestions
+FRIEND_SUGGESTIONS = {
+    'LIMIT': 50,
+    'MUTUAL_WEIGHT': 1.0,
+    'SHARED_FOLLOW_WEIGHT': 0.5,
+    # Подписки на аккаунты с большим числом подписчиков не учитываются
+    'FOLLOW_FANOUT_CAP': config('FRIEND_SUGGESTIONS_FOLLOW_FANOUT_CAP', default=10000, cast=int),
+    'BATCH_SIZE': 500,
+}
+
+# Цепочка дружбы /friends/path/<id>/: глубина и число посещённых узлов на запрос
+FRIEND_PATH = {
+    'MAX_DEPTH': config('FRIEND_PATH_MAX_DEPTH', default=6, cast=int),
+    'NODE_BUDGET': config('FRIEND_PATH_NODE_BUDGET', default=50000, cast=int),
+    'CHUNK': 256,  # узлов фронта на один запрос соседей
+}
+
+# WebSocket чатов: подпротокол msgpack по выбору клиента и окно склейки событий в один фрейм
+CHAT_SOCKET = {
+    'SUBPROTOCOL_MSGPACK': 'msgpack',
+    'COALESCE_WINDOW': config('CHAT_SOCKET_COALESCE_WINDOW', default=0.02, cast=float),
+    'COALESCE_MAX_EVENTS': 50,
+}
+
+# Дельта-синхронизация /chats/sync/ по журналу ChatEvent; старые события удаляет manage.py prune_chat_events
+CHAT_SYNC = {
+    'LIMIT': 500,
+    'RETENTION_DAYS': config('CHAT_SYNC_RETENTION_DAYS', default=30, cast=int),
+    # События моложе этого (сек) не отдаются: их транзакции могут закоммититься не по порядку id
+    'VISIBILITY_LAG': config('CHAT_SYNC_VISIBILITY_LAG', default=5, cast=float),
+}
+
+# Отложенная запись сообщений чата (apps/private_messages/message_buffer.py); OVERFLOW: sync | block | reject
+MESSAGE_BUFFER = {
+    'ENABLED': config('MESSAGE_BUFFER_ENABLED', default=False, cast=bool),
+    'BACKEND': config('MESSAGE_BUFFER_BACKEND', default='apps.private_messages.message_buffer.RedisMessageBuffer'),
+    'OPTIONS': {
+        'location': config('MESSAGE_BUFFER_REDIS_URL', default='redis://127.0.0.1:6379/1'),
+    },
+    'FLUSH_INTERVAL': config('MESSAGE_BUFFER_FLUSH_INTERVAL', default=0.2, cast=float),
+    'FLUSH_BATCH': 500,
+    'MAX_PENDING': config('MESSAGE_BUFFER_MAX_PENDING', default=10000, cast=int),
+    'OVERFLOW': config('MESSAGE_BUFFER_OVERFLOW', default='sync'),
+    'BLOCK_TIMEOUT': 1.0,
+}
+
+# Присутствие и набор текста в чатах (apps/private_messages/presence.py): только TTL-хранилище, без БД
+PRESENCE = {
+    'BACKEND': config('PRESENCE_BACKEND', default='apps.private_messages.presence.LocalPresenceStore'),
+    'OPTIONS': {
+        'location': config('PRESENCE_REDIS_URL', default='redis://127.0.0.1:6379/1'),
+    },
+    # Клиент шлёт heartbeat чаще, чем раз в TTL секунд
+    'TTL': config('PRESENCE_TTL', default=60, cast=int),
+    'TYPING_INTERVAL': config('PRESENCE_TYPING_INTERVAL', default=3, cast=float),
+}
+
+# Помесячные секции Message/Notification (apps/api/partitions.py); обслуживает manage.py manage_partitions
+PARTITIONING = {
+    'MONTHS_AHEAD': 3,
+    'RETAIN_MONTHS': config('PARTITION_RETAIN_MONTHS', default=12, cast=int),
+    'ARCHIVE_DIR': config('PARTITION_ARCHIVE_DIR', default=str(BASE_DIR / 'archive')),
+    'DETACH_LOCK_TIMEOUT': 5,  # сек ожидания блокировки родителя для DETACH
+    # таблица -> колонка, по которой раскладываются файлы архива
+    'TABLES': {
+        'private_messages_message': 'chat_id',
+        'notifications_notification': 'recipient_id',
+    },
+}
+
+# Свёртка уведомлений «X и ещё 12 оценили ваш пост»: один ряд на тип+объект за окно WINDOW секунд
+NOTIFICATION_COALESCING = {
+    'TYPES': ['like', 'comment'],
+    'WINDOW': config('NOTIFICATION_COALESCING_WINDOW', default=86400, cast=int),
+    'RECENT_ACTORS': 3,
+}